@@ -0,0 +1,132 @@
+"""Dividend income analytics over a portfolio, built on pandas"""
+
+from datetime import date
+
+
+class PortfolioAnalytics:
+    """Dividend income metrics per ticker and per currency, as vectorized pandas group-bys"""
+
+    frequency_names = {52: "Weekly", 26: "Bi-Weekly", 12: "Monthly", 4: "Quarterly", 2: "Semi-Annual", 1: "Annual"}
+
+    def __init__(self, tickers, as_of=None, months=12):
+        import numpy as np
+        import pandas as pd
+
+        self.as_of = pd.Timestamp(as_of or date.today())
+        self.months = months
+
+        symbols, currencies, ex_dates, cash_dates, amounts = [], [], [], [], []
+        epoch = date(1970, 1, 1).toordinal()
+        for ticker in tickers:
+            for div in ticker.dividends:
+                if div.ex_date is None:
+                    continue
+                symbols.append(ticker.symbol)
+                currencies.append(ticker.currency)
+                ex_dates.append(div.ex_date.toordinal() - epoch)
+                # Cash lands on the payment date; fall back to the ex-date
+                cash_dates.append((div.payment_date or div.ex_date).toordinal() - epoch)
+                amounts.append(div.amount)
+
+        order = list(dict.fromkeys(t.symbol for t in tickers))
+        self.frame = self.sorted_frame({
+            "ticker": pd.Categorical(symbols, categories=order),
+            "currency": pd.Categorical(currencies),
+            "ex_date": np.array(ex_dates, dtype="datetime64[D]"),
+            "cash_date": np.array(cash_dates, dtype="datetime64[D]"),
+            "amount": np.array(amounts, dtype=float),
+        })
+
+    @classmethod
+    def from_table(cls, table, as_of=None, months=12):
+        """Analytics over a ColumnarSnapshot table instead of parsed tickers"""
+        import pandas as pd
+
+        analytics = cls([], as_of, months)
+        table = table.filter(table["ex_date"].is_valid())
+        df = table.select(["ticker", "currency", "ex_date", "payment_date", "amount"]).to_pandas(
+            date_as_object=False)
+        analytics.frame = cls.sorted_frame({
+            "ticker": df["ticker"],
+            "currency": df["currency"],
+            "ex_date": df["ex_date"],
+            # Cash lands on the payment date; fall back to the ex-date
+            "cash_date": df["payment_date"].fillna(df["ex_date"]),
+            "amount": df["amount"],
+        })
+        return analytics
+
+    @staticmethod
+    def sorted_frame(columns):
+        import pandas as pd
+
+        return pd.DataFrame(columns).sort_values(["ticker", "ex_date"], kind="stable", ignore_index=True)
+
+    def ticker_summary(self):
+        """One row per ticker: TTM payments and income, frequency, forward payout"""
+        import numpy as np
+        import pandas as pd
+
+        df = self.frame
+        # Group on the integer category codes; names are attached at the end
+        codes = df["ticker"].cat.codes
+        by_ticker = df.groupby(codes, sort=True)
+        in_ttm = (df["ex_date"] > self.as_of - pd.Timedelta(days=365)) & (df["ex_date"] <= self.as_of)
+        ttm = df.loc[in_ttm, "amount"].groupby(codes[in_ttm]).agg(["count", "sum"])
+
+        # Median gap between consecutive ex-dates, in days, per ticker
+        gaps = by_ticker["ex_date"].diff().dt.days
+        median_gap = gaps.groupby(codes).median()
+        last = by_ticker.last()
+        ttm = ttm.reindex(last.index)
+
+        # A single payment has no gap, so its frequency (and forward payout) stays unknown
+        raw = (365 / median_gap).clip(1, 52)
+        # Snap to the nearest standard schedule (a 28-day cadence is monthly)
+        standard = np.array(sorted(self.frequency_names))
+        nearest = np.abs(np.log(raw.fillna(1).to_numpy()[:, None] / standard)).argmin(axis=1)
+        frequency = pd.Series(standard[nearest], index=raw.index).where(raw.notna())
+
+        summary = pd.DataFrame({
+            "Currency": last["currency"].astype(str),
+            "Payments (TTM)": ttm["count"],
+            "Income (TTM)": ttm["sum"],
+            "Frequency": frequency,
+            "Last Ex-Date": last["ex_date"].dt.strftime("%Y-%m-%d"),
+            "Last Dividend": last["amount"],
+        })
+        summary.index = df["ticker"].cat.categories[summary.index]
+        summary[["Payments (TTM)", "Income (TTM)"]] = summary[["Payments (TTM)", "Income (TTM)"]].fillna(0)
+        summary["Forward Annual"] = summary["Last Dividend"] * summary["Frequency"]
+        summary["Frequency"] = summary["Frequency"].map(self.frequency_names)
+        summary.index.name = "Ticker"
+        return summary
+
+    def month_columns(self):
+        import pandas as pd
+        end = self.as_of.to_period("M")
+        return pd.period_range(end=end, periods=self.months, freq="M")
+
+    def monthly_calendar(self):
+        """Cash received per ticker per month over the last `months` months"""
+        df = self.frame
+        columns = self.month_columns()
+        month = df["cash_date"].dt.to_period("M")
+        recent = df[(month >= columns[0]) & (month <= columns[-1])]
+        calendar = recent.pivot_table(index="ticker", columns=recent["cash_date"].dt.to_period("M"),
+                                      values="amount", aggfunc="sum", fill_value=0.0, observed=True)
+        calendar = calendar.reindex(columns=columns, fill_value=0.0)
+        calendar.columns = [str(c) for c in calendar.columns]
+        calendar.index = calendar.index.astype(str)
+        calendar.index.name = "Ticker"
+        return calendar
+
+    def portfolio_summary(self):
+        """Totals per currency: TTM income, forward payout and the monthly calendar"""
+        summary = self.ticker_summary()
+        totals = summary.groupby("Currency")[["Income (TTM)", "Forward Annual"]].sum()
+        calendar = self.monthly_calendar()
+        currency = summary["Currency"].reindex(calendar.index)
+        totals = totals.join(calendar.groupby(currency.values).sum())
+        totals.index.name = "Currency"
+        return totals.fillna(0.0)
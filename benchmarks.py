@@ -0,0 +1,449 @@
+"""Benchmarks for Dividend Tracker hot paths.
+
+Every benchmark runs against generated data in a temporary directory, so the
+real portfolio and network are never touched.
+
+Usage:
+    python benchmarks.py excel [--sizes 10000 100000 1000000]
+    python benchmarks.py records [--sizes 10000 100000 1000000]
+    python benchmarks.py startup [--max-import-ms 250]
+    python benchmarks.py analytics [--tickers 10000] [--history 40]
+    python benchmarks.py snapshot [--sizes 1000 10000] [--history 100]
+    python benchmarks.py fx [--rows 1000000]
+    python benchmarks.py suite [--sizes 10 1000 10000] [--output results.json] [--compare old.json]
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import analytics
+import main
+import providers
+import storage
+
+
+def synthetic_portfolio(rows, per_ticker=200, seed=0):
+    """Portfolio entries shaped like dividend_data.json, `rows` dividends in total"""
+    rng = random.Random(seed)
+    portfolio = []
+    for t in range(0, rows, per_ticker):
+        symbol = f"T{t // per_ticker:05d}"
+        count = min(per_ticker, rows - t)
+        # Monthly payers whose latest ex-date is within the last month
+        start = date.today() - timedelta(days=30 * count - rng.randrange(30))
+        dividends = []
+        for i in range(count):
+            ex_date = start + timedelta(days=30 * i)
+            dividends.append({
+                "ex_dividend_date": ex_date.isoformat(),
+                "declaration_date": (ex_date - timedelta(days=14)).isoformat(),
+                "record_date": ex_date.isoformat(),
+                "payment_date": (ex_date + timedelta(days=7)).isoformat(),
+                "amount": f"{rng.uniform(0.01, 2.0):.4f}",
+            })
+        dividends.reverse()  # newest first, like the fetchers store them
+        portfolio.append({"ticker": symbol, "currency": "USD", "dividends": dividends})
+    return portfolio
+
+
+def synthetic_tickers(rows, **kwargs):
+    """Parsed StockTickers for a synthetic portfolio, as the manager holds them"""
+    return [main.StockTicker.from_entry(entry) for entry in synthetic_portfolio(rows, **kwargs)]
+
+
+def traced_size(build):
+    """Bytes still allocated by the object build() returns"""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def measure(fn, *args, memory=True, **kwargs):
+    """Return (wall seconds, peak traced bytes) for fn.
+
+    tracemalloc slows allocation-heavy code several times over, so wall time
+    comes from an untraced run and peak memory from a second, traced one.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    if not memory:
+        return elapsed, 0
+
+    gc.collect()
+    tracemalloc.start()
+    fn(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_excel(sizes, max_inmemory, memory=True):
+    print(f"{'rows':>10} {'mode':>10} {'seconds':>10} {'peak MiB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            data = synthetic_tickers(rows)
+            for streaming in (True, False):
+                if not streaming and rows > max_inmemory:
+                    continue
+                path = os.path.join(tmp, "bench.xlsx")
+                elapsed, peak = measure(main.ExcelExporter(streaming).export, data, path, memory=memory)
+                mode = "streaming" if streaming else "in-memory"
+                print(f"{rows:>10} {mode:>10} {elapsed:>10.2f} {peak / 2 ** 20:>10.1f}")
+            del data
+
+
+def bench_records(sizes):
+    """Memory of raw dividend dicts (as json.load returns them) vs Dividend records"""
+    print(f"{'rows':>10} {'dicts MiB':>10} {'records MiB':>12} {'ratio':>7}")
+    for rows in sizes:
+        raw = json.dumps(synthetic_portfolio(rows))
+        dicts = traced_size(lambda: [div for entry in json.loads(raw) for div in entry["dividends"]])
+        records = traced_size(lambda: [storage.Dividend.from_dict(div)
+                                       for entry in json.loads(raw) for div in entry["dividends"]])
+        print(f"{rows:>10} {dicts / 2 ** 20:>10.1f} {records / 2 ** 20:>12.1f} {dicts / records:>7.1f}x")
+
+
+def bench_analytics(tickers, history):
+    """Time each PortfolioAnalytics stage on `tickers` tickers with `history` dividends each"""
+    portfolio = synthetic_tickers(tickers * history, per_ticker=history)
+    print(f"{tickers} tickers, {tickers * history} dividends")
+    start = time.perf_counter()
+    analytics = analytics.PortfolioAnalytics(portfolio)
+    print(f"  {'build frame':<20} {time.perf_counter() - start:>8.3f} s")
+    for name in ("ticker_summary", "monthly_calendar", "portfolio_summary"):
+        start = time.perf_counter()
+        getattr(analytics, name)()
+        print(f"  {name:<20} {time.perf_counter() - start:>8.3f} s")
+
+
+def bench_snapshot(sizes, history):
+    """Export rows + analytics read from the JSON store vs from the columnar snapshot"""
+    print(f"{'tickers':>8} {'dividends':>10} {'json s':>8} {'rebuild s':>10} {'snapshot s':>11} {'speedup':>8}")
+    here = os.getcwd()
+    for tickers in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                with open("dividend_data.json", "w", encoding="utf-8") as f:
+                    json.dump(synthetic_portfolio(tickers * history, per_ticker=history), f, indent=2)
+                storage.JsonStore().load_index()  # sidecar offsets, so both paths start equal
+
+                def from_json():
+                    manager = main.DividendDataManager("json")
+                    exporter = main.ExcelExporter()
+                    for _ in exporter.iter_rows(manager.tickers):
+                        pass
+                    analytics.PortfolioAnalytics(manager.tickers).ticker_summary()
+
+                def from_snapshot():
+                    manager = main.DividendDataManager("json")
+                    table = manager.snapshot.table()
+                    for _ in main.ExcelExporter.iter_table_rows(table):
+                        pass
+                    analytics.PortfolioAnalytics.from_table(table).ticker_summary()
+
+                json_s, _ = timed(from_json)
+                rebuild_s, _ = timed(main.DividendDataManager("json").snapshot.table)
+                snapshot_s, _ = timed(from_snapshot)
+            finally:
+                os.chdir(here)
+        print(f"{tickers:>8} {tickers * history:>10} {json_s:>8.2f} {rebuild_s:>10.2f} {snapshot_s:>11.2f} "
+              f"{json_s / snapshot_s:>7.1f}x")
+
+
+def bench_fx(rows):
+    """FxRates.convert_rows over `rows` export rows against ~10 years of daily rates"""
+    with tempfile.TemporaryDirectory() as tmp:
+        fx = main.FxRates(os.path.join(tmp, "fx_rates.db"))
+        start = date.today() - timedelta(days=3650)
+        fx.store([((start + timedelta(days=i)).isoformat(), 1.25 + (i % 100) / 1000) for i in range(3650)])
+        fx.checked = True
+        rng = random.Random(0)
+        data = [((start + timedelta(days=rng.randrange(3650))).isoformat(), None, None, None, "T",
+                 rng.choice(("USD", "CAD")), 0.25) for _ in range(rows)]
+        elapsed, _ = timed(lambda: sum(1 for _ in fx.convert_rows(data, "USD")))
+        fx.close()
+    print(f"{rows} rows converted in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+
+
+class ReplayResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class ReplaySession:
+    """Stands in for the pooled requests.Session, answering from recorded payloads"""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    def get(self, url, params=None, timeout=None):
+        return ReplayResponse(self.payloads[params["symbol"]])
+
+
+def recorded_payloads(portfolio):
+    """Alpha Vantage DIVIDENDS responses for each synthetic ticker"""
+    return {entry["ticker"]: {"symbol": entry["ticker"], "data": entry["dividends"]} for entry in portfolio}
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def suite_for_size(tickers, history, ops):
+    """Every hot-path measurement for one portfolio size; runs in the current directory"""
+    portfolio = synthetic_portfolio(tickers * history, per_ticker=history)
+    payloads = recorded_payloads(portfolio)
+    results = {"tickers": tickers, "dividends": tickers * history}
+
+    # Load: DividendDataManager.__init__ for each storage backend
+    with open("dividend_data.json", "w", encoding="utf-8") as f:
+        json.dump(portfolio, f)
+    sqlite = storage.SqliteStore()
+    sqlite.migrate_from_json()
+    sqlite.close()
+    results["load_sqlite_s"], _ = timed(main.DividendDataManager, "sqlite")
+    # First load writes the byte-offset index; later loads only read it
+    results["index_build_s"], _ = timed(storage.JsonStore().load_index)
+    results["load_json_s"], manager = timed(main.DividendDataManager, "json")
+
+    # add_ticker / remove_ticker throughput, with fetching mocked out
+    fresh = [main.StockTicker.from_entry(dict(entry, ticker=f"NEW{i}"))
+             for i, entry in enumerate(portfolio[:ops])]
+    elapsed, _ = timed(lambda: [manager.commit_ticker(t) for t in fresh])
+    results["add_per_s"] = len(fresh) / elapsed
+    elapsed, _ = timed(lambda: [manager.remove_ticker(t.symbol) for t in fresh])
+    results["remove_per_s"] = len(fresh) / elapsed
+    manager.close()
+
+    # fetch_dividends parsing: the Alpha Vantage payload for every ticker
+    parse_tickers = [main.StockTicker(entry["ticker"]) for entry in portfolio]
+    elapsed, _ = timed(lambda: [t.store_dividends(payloads[t.symbol]) for t in parse_tickers])
+    results["parse_records_per_s"] = tickers * history / elapsed
+
+    # Full fetch path (limiter, cache, retries) against recorded responses
+    os.environ.setdefault("ALPHA_VANTAGE_API_KEY", "bench")
+    provider = providers.AlphaVantageProvider(ReplaySession(payloads))
+    limiter = main.RateLimiter(per_minute=10 ** 9, per_day=10 ** 9)
+    cache = main.ResponseCache("bench-cache", ttl=0)
+    sample = portfolio[:ops]
+    elapsed, _ = timed(lambda: [main.StockTicker(e["ticker"], True, limiter, cache, provider) for e in sample])
+    results["fetch_per_s"] = len(sample) / elapsed
+
+    # build_excel: streaming export with analytics sheets
+    loaded = main.DividendDataManager("json").tickers
+    results["excel_s"], results["excel_peak_mib"] = measure(main.ExcelExporter().export, loaded, "bench.xlsx")
+    results["excel_peak_mib"] /= 2 ** 20
+
+    # What App.build_excel actually runs: manager.exporter().update, with the
+    # columnar snapshot, FX columns and manifest diff
+    shipped = main.DividendDataManager("json")
+    exporter = shipped.exporter()
+    results["build_excel_first_s"], _ = timed(exporter.update, shipped.tickers, "shipped.xlsx")
+    results["build_excel_unchanged_s"], _ = timed(exporter.update, shipped.tickers, "shipped.xlsx")
+
+    def small_change(i):
+        # One more ticker with a single history's worth of rows
+        shipped.commit_ticker(main.StockTicker.from_entry(dict(portfolio[0], ticker=f"CHANGE{i}")))
+        return exporter.update(shipped.tickers, "shipped.xlsx")
+
+    results["build_excel_small_change_s"], _ = timed(small_change, 0)
+    gc.collect()
+    tracemalloc.start()
+    small_change(1)
+    results["build_excel_small_change_peak_mib"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return results
+
+
+def compare(results, baseline_path):
+    """Print each metric next to a previous run; >1.00x means better"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    for size, metrics in results.items():
+        old = baseline.get(size)
+        if not old:
+            continue
+        print(f"{size} tickers vs {baseline_path}:")
+        for name, value in metrics.items():
+            if name in ("tickers", "dividends") or name not in old or not old[name]:
+                continue
+            # Rates are better when higher; times and memory when lower
+            ratio = value / old[name] if name.endswith("_per_s") else old[name] / value
+            print(f"  {name:<22} {old[name]:>12.3f} -> {value:>12.3f}  {ratio:>5.2f}x")
+
+
+def bench_suite(sizes, history, ops, output, baseline):
+    results = {}
+    here = os.getcwd()
+    for tickers in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                # The manager's diagnostics are not part of the measurement
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    results[str(tickers)] = suite_for_size(tickers, history, min(ops, tickers))
+            finally:
+                os.chdir(here)
+        print(json.dumps({tickers: results[str(tickers)]}))
+
+    document = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "history": history,
+        },
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    print(f"Wrote {output}")
+    if baseline:
+        compare(results, baseline)
+
+
+# Modules that must not load until a fetch or export needs them
+LAZY_MODULES = ("yfinance", "pandas", "requests", "openpyxl")
+
+IMPORT_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import main
+print(time.perf_counter() - start)
+print(",".join(m for m in {lazy!r} if m in sys.modules))
+"""
+
+WINDOW_SNIPPET = """
+import time
+start = time.perf_counter()
+import tkinter as tk
+import main
+root = tk.Tk()
+app = main.App(root)
+root.update()
+print(time.perf_counter() - start)
+app.on_close()
+"""
+
+
+def run_snippet(code, *flags):
+    here = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=here,
+                          capture_output=True, text=True)
+
+
+def bench_startup(max_import_ms, top):
+    """Import time of main (fresh interpreter), slowest imports, and time to first window"""
+    result = run_snippet(IMPORT_SNIPPET.format(lazy=LAZY_MODULES))
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    seconds, eager = result.stdout.split("\n")[:2]
+    import_ms = float(seconds) * 1000
+    print(f"import main: {import_ms:.0f} ms")
+
+    # -X importtime lines: "import time: self | cumulative | module"
+    timings = []
+    for line in run_snippet("import main", "-X", "importtime").stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            timings.append((int(parts[1]), parts[2].strip()))
+    print("slowest imports (cumulative):")
+    for cumulative, module in sorted(timings, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {module}")
+
+    result = run_snippet(WINDOW_SNIPPET)
+    if result.returncode == 0:
+        print(f"time to first window: {float(result.stdout.split()[0]) * 1000:.0f} ms")
+    else:
+        print("time to first window: skipped (no display)")
+
+    failed = False
+    if eager:
+        print(f"FAIL: imported at startup: {eager}")
+        failed = True
+    if import_ms > max_import_ms:
+        print(f"FAIL: import main took {import_ms:.0f} ms (limit {max_import_ms} ms)")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    excel = sub.add_parser("excel", help="Excel export wall time and peak memory")
+    excel.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    excel.add_argument("--max-inmemory", type=int, default=100_000,
+                       help="skip the in-memory workbook above this many rows")
+    excel.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory pass")
+
+    records = sub.add_parser("records", help="memory footprint of dividend dicts vs Dividend records")
+    records.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+
+    startup = sub.add_parser("startup", help="import time and time to first window")
+    startup.add_argument("--max-import-ms", type=float, default=250,
+                         help="fail if importing main takes longer than this")
+    startup.add_argument("--top", type=int, default=10, help="how many of the slowest imports to list")
+
+    analytics = sub.add_parser("analytics", help="income analytics on a large synthetic portfolio")
+    analytics.add_argument("--tickers", type=int, default=10_000)
+    analytics.add_argument("--history", type=int, default=40, help="dividends per ticker")
+
+    snapshot = sub.add_parser("snapshot", help="export/analytics from JSON vs the columnar snapshot")
+    snapshot.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000], help="tickers per portfolio")
+    snapshot.add_argument("--history", type=int, default=100, help="dividends per ticker")
+
+    fx = sub.add_parser("fx", help="as-of FX conversion of export rows")
+    fx.add_argument("--rows", type=int, default=1_000_000)
+
+    suite = sub.add_parser("suite", help="load, mutate, fetch and export hot paths; results as JSON")
+    suite.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 10_000], help="tickers per portfolio")
+    suite.add_argument("--history", type=int, default=100, help="dividends per ticker")
+    suite.add_argument("--ops", type=int, default=500, help="adds/removes/fetches per size")
+    suite.add_argument("--output", default="bench_results.json")
+    suite.add_argument("--compare", metavar="JSON", help="previous results file to compare against")
+
+    args = parser.parse_args()
+    if args.benchmark == "excel":
+        bench_excel(args.sizes, args.max_inmemory, not args.no_memory)
+    elif args.benchmark == "records":
+        bench_records(args.sizes)
+    elif args.benchmark == "startup":
+        bench_startup(args.max_import_ms, args.top)
+    elif args.benchmark == "analytics":
+        bench_analytics(args.tickers, args.history)
+    elif args.benchmark == "snapshot":
+        bench_snapshot(args.sizes, args.history)
+    elif args.benchmark == "fx":
+        bench_fx(args.rows)
+    elif args.benchmark == "suite":
+        bench_suite(args.sizes, args.history, args.ops, args.output, args.compare)
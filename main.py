@@ -1,25 +1,36 @@
-import yfinance as yf
+# yfinance, requests and openpyxl are imported where they are first used, so
+# the window comes up without paying for them (yfinance alone pulls in pandas)
 import json
-import pandas as pd
 from pathlib import Path
 from dotenv import load_dotenv
 import os
-import requests
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
+import sys
+import contextlib
 import tkinter as tk
 from tkinter import ttk, messagebox
+import tkinter.font as tkfont
 import re
+import bisect
 import time
-from datetime import datetime
-
-# Create a new workbook
-wb = Workbook()
-ws = wb.active
-ws.title = "Dividends"
+import hashlib
+import threading
+import queue
+import heapq
+import itertools
+import statistics
+import sqlite3
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
 
 load_dotenv()
 
+# The local modules read their settings from the environment when imported
+from metrics import METRICS
+from analytics import PortfolioAnalytics
+from storage import Dividend, ColumnarSnapshot, make_store
+from providers import AlphaVantageProvider, provider_for, shared_session
+
 class ValidationUtils:
     """Utility class for input validation and error handling"""
     
@@ -52,11 +63,293 @@ class ValidationUtils:
     def is_duplicate_ticker(symbol, existing_tickers):
         """Check if ticker already exists in portfolio"""
         symbol = symbol.strip().upper()
+        # Indexed collections (a SymbolIndex, or a dict/set keyed by symbol) answer directly
+        if isinstance(existing_tickers, (SymbolIndex, dict, set, frozenset)):
+            return symbol in existing_tickers
         for ticker in existing_tickers:
             if hasattr(ticker, 'symbol') and ticker.symbol == symbol:
                 return True
         return False
 
+class TokenBucket:
+    """Token bucket holding up to `capacity` tokens, refilled evenly over `period` seconds"""
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.capacity / self.period)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until one token is available"""
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.period / self.capacity
+
+
+class RateLimiter:
+    """Thread-safe per-minute and per-day token buckets shared by all Alpha Vantage requests"""
+
+    def __init__(self, per_minute=5, per_day=25, max_wait=120):
+        self.minute = TokenBucket(per_minute, 60)
+        self.day = TokenBucket(per_day, 24 * 60 * 60)
+        self.max_wait = max_wait
+        self.paused_until = 0.0
+        self.calls = 0  # tokens handed out by this limiter
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a limiter from ALPHA_VANTAGE_CALLS_PER_MINUTE / _PER_DAY"""
+        per_minute = int(os.getenv("ALPHA_VANTAGE_CALLS_PER_MINUTE", "5"))
+        per_day = int(os.getenv("ALPHA_VANTAGE_CALLS_PER_DAY", "25"))
+        return cls(per_minute, per_day)
+
+    def acquire(self):
+        """Wait for a token. Returns False if the daily quota is exhausted."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if self.day.wait_time(now) > self.max_wait:
+                    METRICS.count("quota_exhausted")
+                    return False
+                wait = max(self.paused_until - now,
+                           self.minute.wait_time(now),
+                           self.day.wait_time(now))
+                if wait <= 0:
+                    self.minute.tokens -= 1
+                    self.day.tokens -= 1
+                    self.calls += 1
+                    if waited:
+                        METRICS.observe("rate_limit_wait", waited)
+                    return True
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds):
+        """Hold back all workers for `seconds` after a throttle response"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class ResponseCache:
+    """On-disk cache of provider responses (one JSON file each) with a TTL, LRU size limit and offline mode"""
+
+    def __init__(self, directory=".dividend_cache", ttl=6 * 60 * 60,
+                 max_bytes=50 * 1024 * 1024, offline=False):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.total = None  # bytes on disk, seeded by the first evict() scan
+        self.evicting = False
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache from DIVIDEND_CACHE_DIR / _TTL / _MAX_MB and DIVIDEND_OFFLINE"""
+        return cls(
+            directory=os.getenv("DIVIDEND_CACHE_DIR", ".dividend_cache"),
+            ttl=float(os.getenv("DIVIDEND_CACHE_TTL", 6 * 60 * 60)),
+            max_bytes=int(float(os.getenv("DIVIDEND_CACHE_MAX_MB", 50)) * 1024 * 1024),
+            offline=os.getenv("DIVIDEND_OFFLINE", "").lower() in ("1", "true", "yes"),
+        )
+
+    def path_for(self, provider, symbol, params):
+        key = json.dumps([provider, symbol, params], sort_keys=True)
+        return self.directory / (hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, provider, symbol, params):
+        """Return the cached payload, or None on a miss or expired entry"""
+        path = self.path_for(provider, symbol, params)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            fresh = time.time() - entry["stored_at"] <= self.ttl
+        except (OSError, ValueError, KeyError):
+            entry, fresh = None, False
+
+        with self.lock:
+            if entry is not None and (fresh or self.offline):
+                self.hits += 1
+                try:
+                    os.utime(path)  # mark as recently used
+                except OSError:
+                    pass
+                METRICS.count("cache_hits", symbol=symbol, provider=provider)
+                return entry["payload"]
+            self.misses += 1
+        METRICS.count("cache_misses", symbol=symbol, provider=provider)
+        return None
+
+    def put(self, provider, symbol, params, payload):
+        """Store a payload and evict old entries if over the size limit"""
+        path = self.path_for(provider, symbol, params)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"stored_at": time.time(), "payload": payload}, f)
+        size = tmp.stat().st_size
+        try:
+            size -= path.stat().st_size  # replacing an entry frees its old size
+        except OSError:
+            pass
+        os.replace(tmp, path)
+
+        # The running total is seeded by the first eviction scan; only scan
+        # again once it goes over the limit, and never while holding the lock
+        with self.lock:
+            if self.total is not None:
+                self.total += size
+            scan = not self.evicting and (self.total is None or self.total > self.max_bytes)
+            self.evicting = self.evicting or scan
+        if scan:
+            try:
+                self.evict()
+            finally:
+                with self.lock:
+                    self.evicting = False
+
+    def evict(self):
+        """Drop least recently used entries down to 90% of max_bytes and reset the running total"""
+        entries = []
+        for p in self.directory.glob("*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            # Leave some headroom so the next few puts don't rescan
+            target = self.max_bytes * 0.9
+            for _, size, p in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    p.unlink()
+                except OSError:
+                    continue
+                total -= size
+        with self.lock:
+            self.total = total
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+class RefreshReport:
+    """Per-ticker outcome of a DividendDataManager.refresh_all run"""
+
+    def __init__(self):
+        self.succeeded = []
+        self.failed = {}
+        self.new_dividends = 0
+        self.elapsed = 0.0
+
+    def summary(self):
+        return (f"Refreshed {len(self.succeeded)} tickers ({self.new_dividends} new dividends), "
+                f"{len(self.failed)} failed in {self.elapsed:.1f}s")
+
+
+class VirtualListbox:
+    """Listbox that only ever holds the rows currently on screen, however long `items` is"""
+
+    def __init__(self, parent, **options):
+        self.listbox = tk.Listbox(parent, exportselection=False, **options)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+        self.items = []
+        self.top = 0
+        self.rows = 1
+        self.selected = None
+        self.line_height = tkfont.Font(font=self.listbox.cget("font")).metrics("linespace") + 1
+
+        self.listbox.bind("<Configure>", self.on_resize)
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1, "units"))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll(-1, "units"))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll(1, "units"))
+        self.listbox.bind("<Up>", lambda e: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda e: self.move_selection(1))
+
+    def pack(self, **options):
+        self.listbox.pack(side="left", fill="both", expand=True, **options)
+        self.scrollbar.pack(side="right", fill="y")
+
+    def set_items(self, items, keep_position=False):
+        """Show `items`; keep_position holds the scroll offset (e.g. after an add or remove)"""
+        self.items = items
+        self.selected = None
+        if not keep_position:
+            self.top = 0
+        self.render()
+
+    def selection(self):
+        """The selected item, or None"""
+        if self.selected is None or self.selected >= len(self.items):
+            return None
+        return self.items[self.selected]
+
+    def render(self):
+        self.top = max(0, min(self.top, len(self.items) - self.rows))
+        visible = self.items[self.top:self.top + self.rows]
+        self.listbox.delete(0, tk.END)
+        if visible:
+            self.listbox.insert(tk.END, *visible)
+        if self.selected is not None and self.top <= self.selected < self.top + self.rows:
+            self.listbox.selection_set(self.selected - self.top)
+        if self.items:
+            self.scrollbar.set(self.top / len(self.items), min(1.0, (self.top + self.rows) / len(self.items)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def on_resize(self, event):
+        rows = max(1, event.height // self.line_height)
+        if rows != self.rows:
+            self.rows = rows
+            self.render()
+
+    def on_select(self, event):
+        selected = self.listbox.curselection()
+        if selected:
+            self.selected = self.top + selected[0]
+
+    def yview(self, action, amount, unit=None):
+        """Scrollbar callback: ("moveto", fraction) or ("scroll", n, "units"|"pages")"""
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.items))
+            self.render()
+        else:
+            self.scroll(int(amount), unit)
+
+    def scroll(self, amount, unit):
+        self.top += amount * (self.rows if unit == "pages" else 1)
+        self.render()
+        return "break"
+
+    def move_selection(self, step):
+        if not self.items:
+            return "break"
+        current = self.selected if self.selected is not None else self.top - step
+        self.selected = max(0, min(len(self.items) - 1, current + step))
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + self.rows:
+            self.top = self.selected - self.rows + 1
+        self.render()
+        return "break"
+
+
 class App():
     def __init__(self, root):
         self.root = root
@@ -66,30 +359,43 @@ class App():
         self.style = ttk.Style()
         self.style.theme_use("clam")
 
-        self.dataManager = DividendDataManager()
-        self.setup_ui()
+        # The portfolio loads in the background so the window shows immediately
+        self.dataManager = DividendDataManager(load=False)
 
-        
+        # Background fetches: workers post (symbol, future) to self.results
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.load_future = self.executor.submit(self.dataManager.load_tickers)
+        self.fx_future = None
+        self.results = queue.Queue()
+        self.pending = {}
+        self.poll_id = None
+        self.batch_total = self.batch_done = 0
+        self.batch_added, self.batch_failed = [], []
+
+        self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(50, self.poll_loading)
 
     def setup_ui(self):
         # Frame for ticker list
         list_frame = ttk.LabelFrame(self.root, text="Current Stock Tickers")
         list_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
-        self.ticker_listbox = tk.Listbox(list_frame, height=10, font=("Segoe UI", 12))
-        self.ticker_listbox.pack(side="left", fill="both", expand=True, padx=(10,0), pady=10)
+        # Search-as-you-type filter over the symbol index
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.refresh_list())
+        search_entry = ttk.Entry(list_frame, textvariable=self.search_var, font=("Segoe UI", 12))
+        search_entry.pack(side="top", fill="x", padx=10, pady=(10,0))
 
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.ticker_listbox.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.ticker_listbox.config(yscrollcommand=scrollbar.set)
-        # Populate listbox
-        for ticker in self.dataManager.tickers:
-           self.ticker_listbox.insert(tk.END, ticker.symbol)
+        # Only the visible rows are ever inserted, however large the portfolio
+        self.ticker_list = VirtualListbox(list_frame, height=10, font=("Segoe UI", 12))
+        self.ticker_list.pack(padx=(10,0), pady=10)
+        self.ticker_list.set_items(["Loading portfolio..."])
 
         # Frame for adding/removing tickers
         control_frame = ttk.Frame(self.root)
         control_frame.pack(fill="x", padx=10, pady=10)
+        self.control_frame = control_frame
 
         self.ticker_entry = ttk.Entry(control_frame, font=("Segoe UI", 12))
         self.ticker_entry.pack(side="left", fill="x", expand=True, padx=(0,10))
@@ -100,6 +406,15 @@ class App():
         remove_button = ttk.Button(control_frame, text="Remove Selected", command=self.update_ticker_list)
         remove_button.pack(side="left")
 
+        # Progress bar and cancel button, shown only while fetches are running
+        self.loading_frame = ttk.Frame(self.root)
+        self.status_label = ttk.Label(self.loading_frame, text="")
+        self.status_label.pack(side="top", anchor="w")
+        self.progress = ttk.Progressbar(self.loading_frame, mode="determinate")
+        self.progress.pack(side="left", fill="x", expand=True, padx=(0,10))
+        cancel_button = ttk.Button(self.loading_frame, text="Cancel", command=self.cancel_loading)
+        cancel_button.pack(side="left")
+
         # Export/update buttons at bottom
         bottom_frame = ttk.Frame(self.root)
         bottom_frame.pack(fill="x", padx=10, pady=10)
@@ -112,144 +427,164 @@ class App():
         
 
     
+    def poll_loading(self):
+        """Populate the list once the background portfolio load finishes"""
+        if not self.load_future.done():
+            self.root.after(50, self.poll_loading)
+            return
+        try:
+            self.dataManager.finish_loading(self.load_future.result())
+        except Exception as e:
+            messagebox.showerror("Data Error", f"Error reading portfolio data: {str(e)}")
+            self.dataManager.loaded = True
+        # FX rates may need a download; never on the Tk thread
+        self.fx_future = self.executor.submit(self.dataManager.fx.ensure_current)
+        self.refresh_list()
+
+    def refresh_list(self, keep_position=False):
+        """Show the portfolio, or the symbols starting with the search text"""
+        if not self.dataManager.loaded:
+            return
+        prefix = self.search_var.get().strip().upper()
+        if prefix:
+            symbols = self.dataManager.index.search(prefix)
+        else:
+            symbols = self.dataManager.index.symbols()
+        self.ticker_list.set_items(symbols, keep_position)
+
     def update_ticker_list(self):
-        selected = self.ticker_listbox.curselection()
-        if selected:
-            symbol = self.ticker_listbox.get(selected[0])
-            self.ticker_listbox.delete(selected[0])
+        symbol = self.ticker_list.selection()
+        if symbol and self.dataManager.loaded:
             self.dataManager.remove_ticker(symbol)
+            self.refresh_list(keep_position=True)
 
     def add_ticker(self):
-        """Add a new ticker with validation and error handling"""
+        """Queue one or more tickers (comma/space separated) for fetching"""
+        if not self.dataManager.loaded:
+            # Duplicate checks need the whole portfolio
+            messagebox.showinfo("Loading", "Your portfolio is still loading, please try again in a moment.")
+            return
         try:
-            new_ticker = self.ticker_entry.get().strip()
-            
-            # Validate ticker symbol
-            is_valid, result = ValidationUtils.validate_ticker_symbol(new_ticker)
-            if not is_valid:
-                messagebox.showerror("Invalid Ticker", f"Error: {result}")
-                return
-            
-            new_ticker = result  # Use the validated/cleaned symbol
-            
-            # Check for duplicates
-            if ValidationUtils.is_duplicate_ticker(new_ticker, self.dataManager.tickers):
-                messagebox.showwarning("Duplicate Ticker", f"'{new_ticker}' is already in your portfolio")
-                return
-            
-            # Show loading state
-            self.show_loading_state()
-            
-            # Add ticker with error handling
-            success = self.dataManager.add_ticker(new_ticker)
-            
-            if success:
-                self.ticker_listbox.insert(tk.END, new_ticker)
-                messagebox.showinfo("Success", f"Successfully added {new_ticker} to your portfolio")
-            else:
-                messagebox.showerror("Error", f"Failed to add {new_ticker}. Please check the ticker symbol and try again.")
-                
+            entries = [e for e in re.split(r"[,\s]+", self.ticker_entry.get().strip()) if e]
+            for new_ticker in entries or [""]:
+                # Validate ticker symbol
+                is_valid, result = ValidationUtils.validate_ticker_symbol(new_ticker)
+                if not is_valid:
+                    messagebox.showerror("Invalid Ticker", f"Error: {result}")
+                    continue
+
+                new_ticker = result  # Use the validated/cleaned symbol
+
+                # Check for duplicates, including tickers still loading
+                if (ValidationUtils.is_duplicate_ticker(new_ticker, self.dataManager.index)
+                        or new_ticker in self.pending):
+                    messagebox.showwarning("Duplicate Ticker", f"'{new_ticker}' is already in your portfolio")
+                    continue
+
+                # Fetch on a worker thread; poll_results picks up the outcome
+                future = self.executor.submit(self.dataManager.fetch_ticker, new_ticker)
+                future.add_done_callback(lambda f, symbol=new_ticker: self.results.put((symbol, f)))
+                self.pending[new_ticker] = future
+                self.batch_total += 1
+
+            if self.pending:
+                self.show_loading_state()
+
         except Exception as e:
             messagebox.showerror("Unexpected Error", f"An unexpected error occurred: {str(e)}")
         finally:
             self.ticker_entry.delete(0, tk.END)
+
+    def poll_results(self):
+        """Apply finished fetches on the Tk thread, then re-arm while work is pending"""
+        while True:
+            try:
+                symbol, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if self.pending.get(symbol) is not future:
+                continue  # cancelled by the user
+            del self.pending[symbol]
+            self.batch_done += 1
+            try:
+                ticker = future.result()
+                success = self.dataManager.commit_ticker(ticker)
+            except Exception as e:
+                print(f"Error adding ticker {symbol}: {e}")
+                success = False
+            if success:
+                self.batch_added.append(symbol)
+            else:
+                self.batch_failed.append(symbol)
+
+        if self.batch_added:
+            self.refresh_list(keep_position=True)
+        if self.pending:
+            self.update_progress()
+            self.poll_id = self.root.after(100, self.poll_results)
+        else:
+            self.poll_id = None
             self.hide_loading_state()
-    
+
+    def cancel_loading(self):
+        """Drop every queued or in-flight fetch"""
+        for future in self.pending.values():
+            future.cancel()  # only stops fetches that haven't started yet
+        self.pending.clear()
+        self.hide_loading_state()
+
+    def update_progress(self):
+        self.progress.config(maximum=max(self.batch_total, 1), value=self.batch_done)
+        loading = ", ".join(list(self.pending)[:3])
+        if len(self.pending) > 3:
+            loading += ", ..."
+        self.status_label.config(text=f"Loading {loading} ({self.batch_done}/{self.batch_total})")
+
     def show_loading_state(self):
-        """Show loading indicator during API calls"""
-        self.ticker_entry.config(state='disabled')
-        # Add a progress bar / loading label here
-    
+        """Show progress bar and cancel button while fetches are running"""
+        self.update_progress()
+        self.loading_frame.pack(fill="x", padx=10, after=self.control_frame)
+        if self.poll_id is None:
+            self.poll_id = self.root.after(100, self.poll_results)
+
     def hide_loading_state(self):
-        """Hide loading indicator after API calls"""
-        self.ticker_entry.config(state='normal')
+        """Hide progress bar and report the finished batch"""
+        self.loading_frame.pack_forget()
+        added, failed = self.batch_added, self.batch_failed
+        self.batch_total = self.batch_done = 0
+        self.batch_added, self.batch_failed = [], []
+        if failed:
+            messagebox.showerror("Error", f"Failed to add {', '.join(failed)}. "
+                                 "Please check the ticker symbol and try again.")
+        elif added:
+            messagebox.showinfo("Success", f"Successfully added {', '.join(added)} to your portfolio")
+
+    def on_close(self):
+        # Drop queued fetches by hand; shutdown(cancel_futures=True) needs Python 3.9
+        for future in self.pending.values():
+            future.cancel()
+        self.executor.shutdown(wait=False)
+        self.root.destroy()
+        # The portfolio load and FX top-up use the stores; let them finish before closing
+        concurrent.futures.wait([future for future in (self.load_future, self.fx_future) if future is not None])
+        self.dataManager.close()
 
     def build_excel(self):
         """Build Excel file with comprehensive error handling"""
         try:
-            path = Path("dividend_data.json")
-            if not path.is_file():
-                messagebox.showerror("File Not Found", "dividend_data.json not found. Please add some tickers first.")
-                return
-
-            # Load JSON data
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    dividend_data = json.load(f)
-            except json.JSONDecodeError as e:
-                messagebox.showerror("Data Error", f"Error reading portfolio data: {str(e)}")
+            if not self.dataManager.loaded:
+                messagebox.showinfo("Loading", "Your portfolio is still loading, please try again in a moment.")
                 return
-            except Exception as e:
-                messagebox.showerror("File Error", f"Error opening portfolio file: {str(e)}")
+            if not self.dataManager.tickers:
+                messagebox.showerror("No Data", "Your portfolio is empty. Please add some tickers first.")
                 return
 
-            # Create workbook
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Dividends"
-
-            # Headers - expanded to include all Alpha Vantage fields
-            headers = ["Ex-Date", "Declaration Date", "Record Date", "Payment Date", "Ticker", "Currency", "Dividend"]
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-            alignment = Alignment(horizontal="center", vertical="center")
-
-            for col_num, title in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col_num, value=title)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = alignment
-
-            # Column widths
-            ws.column_dimensions["A"].width = 15  # Ex-Date
-            ws.column_dimensions["B"].width = 15  # Declaration Date
-            ws.column_dimensions["C"].width = 15  # Record Date
-            ws.column_dimensions["D"].width = 15  # Payment Date
-            ws.column_dimensions["E"].width = 12  # Ticker
-            ws.column_dimensions["F"].width = 10  # Currency
-            ws.column_dimensions["G"].width = 12  # Dividend
-
-            # Fill rows
-            row_num = 2
-            for entry in dividend_data:
-                ticker = entry.get("ticker")
-                currency = entry.get("currency", "USD")
-                for div in entry.get("dividends", []):
-                    # Handle both TSX (ex_date) and US (ex_dividend_date) formats
-                    ex_date = div.get("ex_date") or div.get("ex_dividend_date")
-                    declaration_date = div.get("declaration_date")
-                    record_date = div.get("record_date")
-                    payment_date = div.get("payment_date")
-                    amount = div.get("amount")
-                    
-                    # Convert amount to float for proper Excel number formatting
-                    try:
-                        amount = float(amount) if amount else 0
-                    except (ValueError, TypeError):
-                        amount = 0
-                    
-                    # Convert "None" strings to empty cells for better Excel display
-                    if declaration_date == "None":
-                        declaration_date = ""
-                    if record_date == "None":
-                        record_date = ""
-                    if payment_date == "None":
-                        payment_date = ""
-                    
-                    ws.cell(row=row_num, column=1, value=ex_date)
-                    ws.cell(row=row_num, column=2, value=declaration_date)
-                    ws.cell(row=row_num, column=3, value=record_date)
-                    ws.cell(row=row_num, column=4, value=payment_date)
-                    ws.cell(row=row_num, column=5, value=ticker)
-                    ws.cell(row=row_num, column=6, value=currency)
-                    ws.cell(row=row_num, column=7, value=amount)
-                    row_num += 1
-
             # Save workbook
             output_path = "dividends-sheet.xlsx"
             try:
-                wb.save(output_path)
-                messagebox.showinfo("Success", f"Excel file saved successfully!\nLocation: {output_path}")
+                added, removed = self.dataManager.exporter().update(self.dataManager.tickers, output_path)
+                messagebox.showinfo("Success", f"Excel file saved successfully!\nLocation: {output_path}\n"
+                                    f"{added} rows added, {removed} rows removed")
                 return output_path
             except PermissionError:
                 messagebox.showerror("Permission Error", 
@@ -293,222 +628,1058 @@ class App():
             messagebox.showerror("Error", f"Error opening Excel file: {str(e)}")
 
 
+class ExcelExporter:
+    """Writes portfolio dividends, FX-converted amounts and analytics sheets to a formatted Excel workbook"""
+
+    # Headers - expanded to include all Alpha Vantage fields
+    headers = ["Ex-Date", "Declaration Date", "Record Date", "Payment Date", "Ticker", "Currency", "Dividend"]
+    column_widths = {"A": 15, "B": 15, "C": 15, "D": 15, "E": 12, "F": 10, "G": 12}
+
+    # Extra sheets built from PortfolioAnalytics: title -> method name
+    analytics_sheets = {
+        "Income Summary": "ticker_summary",
+        "Monthly Calendar": "monthly_calendar",
+        "Portfolio": "portfolio_summary",
+    }
+
+    # Largest sheet update() patches in place; beyond this a streaming rewrite wins
+    patch_max_rows = 1000
+
+    def __init__(self, streaming=True, analytics=True, snapshot=None, fx=None, base_currency=None):
+        self.streaming = streaming
+        self.analytics = analytics
+        self.snapshot = snapshot
+        self.fx = fx
+        if fx is not None:
+            self.base_currency = (base_currency or os.getenv("DIVIDEND_BASE_CURRENCY", "USD")).upper()
+            self.headers = self.headers + ["USD/CAD", f"Dividend ({self.base_currency})"]
+            self.column_widths = dict(self.column_widths, H=10, I=15)
+
+    def rows(self, tickers):
+        """Row tuples from the snapshot if there is one, else from `tickers`"""
+        if self.snapshot is not None:
+            rows = self.iter_table_rows(self.snapshot.table())
+        else:
+            rows = self.iter_rows(tickers)
+        if self.fx is not None:
+            # Only the stored table is read here; callers top it up beforehand
+            # (FxRates.ensure_current, off the Tk thread in the GUI)
+            rows = self.fx.convert_rows(rows, self.base_currency)
+        return rows
+
+    @staticmethod
+    def iter_rows(tickers):
+        """Yield one row tuple per dividend in the portfolio"""
+        for ticker in tickers:
+            symbol = ticker.symbol
+            currency = ticker.currency
+            for div in ticker.dividends:
+                yield (
+                    div.ex_date.isoformat() if div.ex_date else None,
+                    div.declaration_date.isoformat() if div.declaration_date else None,
+                    div.record_date.isoformat() if div.record_date else None,
+                    div.payment_date.isoformat() if div.payment_date else None,
+                    symbol,
+                    currency,
+                    div.amount,
+                )
+
+    @staticmethod
+    def iter_table_rows(table):
+        """Yield the same row tuples as iter_rows, one Arrow record batch at a time"""
+        import pyarrow as pa
+
+        names = ("ex_date", "declaration_date", "record_date", "payment_date", "ticker", "currency")
+        for batch in table.to_batches(max_chunksize=10000):
+            columns = [batch.column(batch.schema.get_field_index(name)).cast(pa.string()).to_pylist()
+                       for name in names]
+            columns.append(batch.column(batch.schema.get_field_index("amount")).to_pylist())
+            yield from zip(*columns)
+
+    def export(self, tickers, output_path):
+        """Write every dividend of `tickers` to `output_path`"""
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=self.streaming)
+        if self.streaming:
+            ws = wb.create_sheet("Dividends")
+        else:
+            ws = wb.active
+            ws.title = "Dividends"
+
+        # Column widths must be set before the first row in write-only mode
+        for column, width in self.column_widths.items():
+            ws.column_dimensions[column].width = width
+
+        stamp = self.store_stamp()
+        with METRICS.span("workbook_build", mode="full"):
+            ws.append(self.header_row(ws))
+            keys = []
+            for row in self.rows(tickers):
+                ws.append(row)
+                keys.append(self.row_key(row))
+
+            if self.analytics:
+                self.write_analytics(wb, tickers)
+
+        with METRICS.span("workbook_save", mode="full"):
+            wb.save(output_path)
+            self.write_manifest(output_path, keys, stamp)
+        METRICS.write()
+        return output_path
+
+    def export_as(self, tickers, output_path, fmt="xlsx", full=False):
+        """Export in any supported format; returns the number of dividend rows"""
+        if fmt == "xlsx":
+            if full:
+                self.export(tickers, output_path)
+            else:
+                self.update(tickers, output_path)
+            return len(self.read_manifest(output_path))
+        if fmt == "csv":
+            import csv
+
+            count = 0
+            with open(output_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(self.headers)
+                for row in self.rows(tickers):
+                    writer.writerow(row)
+                    count += 1
+            return count
+        if fmt == "parquet":
+            import pandas as pd
+
+            frame = pd.DataFrame(self.rows(tickers), columns=self.headers)
+            for column in self.headers[:4]:
+                frame[column] = pd.to_datetime(frame[column])
+            frame.to_parquet(output_path, index=False)
+            return len(frame)
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    def update(self, tickers, output_path):
+        """Skip an unchanged workbook, patch a small one in place, else rewrite it; returns (rows added, rows removed)"""
+        stamp = self.store_stamp()
+        manifest = self.load_manifest(output_path)
+        if manifest is None or not Path(output_path).is_file():
+            self.export(tickers, output_path)
+            return len(self.read_manifest(output_path)), 0
+        if stamp is not None and manifest.get("stamp") == stamp:
+            return 0, 0
+        keys = [tuple(key) for key in manifest["rows"]]
+
+        # Work out the change from the manifest alone, before touching the workbook
+        symbols = {ticker.symbol for ticker in tickers}
+        stale = [i for i, key in enumerate(keys) if key[0] not in symbols]
+        written = set(keys)
+        new_rows = []
+        for row in self.rows(tickers):
+            key = self.row_key(row)
+            if key not in written:
+                new_rows.append(row)
+                written.add(key)
+        if not stale and not new_rows:
+            self.write_manifest(output_path, keys, stamp)  # skip the scan next time
+            return 0, 0
+        if len(keys) > self.patch_max_rows:
+            self.export(tickers, output_path)
+            return len(new_rows), len(stale)
+
+        from openpyxl import load_workbook
+
+        with METRICS.span("workbook_load"):
+            wb = load_workbook(output_path)
+        ws = wb["Dividends"] if "Dividends" in wb.sheetnames else wb.active
+        if ws.max_row - 1 != len(keys):
+            print("Excel sheet doesn't match its manifest, rebuilding")
+            self.export(tickers, output_path)
+            return len(self.read_manifest(output_path)), 0
+
+        with METRICS.span("workbook_build", mode="update"):
+            # Rows for removed tickers are deleted bottom-up in contiguous runs
+            for first, count in reversed(self.runs(stale)):
+                ws.delete_rows(first + 2, count)  # +2: header row and 1-based rows
+            stale_set = set(stale)
+            keys = [key for i, key in enumerate(keys) if i not in stale_set]
+
+            # New dividends are appended at the bottom
+            for row in new_rows:
+                ws.append(row)
+                keys.append(self.row_key(row))
+
+            # Analytics sheets are derived from every row, so they are rebuilt
+            if self.analytics:
+                for title in self.analytics_sheets:
+                    if title in wb.sheetnames:
+                        del wb[title]
+                self.write_analytics(wb, tickers)
+
+        with METRICS.span("workbook_save", mode="update"):
+            wb.save(output_path)
+            self.write_manifest(output_path, keys, stamp)
+        METRICS.write()
+        return len(new_rows), len(stale)
+
+    @staticmethod
+    def row_key(row):
+        return (row[4], row[0])  # (ticker, ex-date)
+
+    @staticmethod
+    def runs(indices):
+        """Group sorted indices into (start, length) runs of consecutive values"""
+        runs = []
+        for i in indices:
+            if runs and runs[-1][0] + runs[-1][1] == i:
+                runs[-1][1] += 1
+            else:
+                runs.append([i, 1])
+        return runs
+
+    @staticmethod
+    def manifest_path(output_path):
+        return Path(output_path).with_suffix(".manifest.json")
+
+    def store_stamp(self):
+        """The snapshot's store stamp as a string, or None without a snapshot"""
+        return json.dumps(self.snapshot.store.stamp()) if self.snapshot is not None else None
+
+    def write_manifest(self, output_path, keys, stamp=None):
+        """Record which (ticker, ex-date) each sheet row holds, in row order, and the store stamp"""
+        path = self.manifest_path(output_path)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "columns": self.headers, "stamp": stamp, "rows": keys}, f)
+        os.replace(tmp, path)
+
+    def load_manifest(self, output_path):
+        try:
+            with open(self.manifest_path(output_path), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # A sheet written with different columns (e.g. before FX conversion) is rebuilt
+        if manifest.get("version") != 1 or manifest.get("columns", ExcelExporter.headers) != self.headers:
+            return None
+        return manifest
+
+    def read_manifest(self, output_path):
+        manifest = self.load_manifest(output_path)
+        return None if manifest is None else [tuple(key) for key in manifest["rows"]]
+
+    def write_analytics(self, wb, tickers):
+        """Add one sheet per PortfolioAnalytics table"""
+        from openpyxl.utils import get_column_letter
+
+        if self.snapshot is not None:
+            analytics = PortfolioAnalytics.from_table(self.snapshot.table())
+        else:
+            analytics = PortfolioAnalytics(tickers)
+        for title, method in self.analytics_sheets.items():
+            frame = getattr(analytics, method)()
+            ws = wb.create_sheet(title)
+            headers = [frame.index.name] + [str(c) for c in frame.columns]
+            ws.column_dimensions["A"].width = 12
+            for i in range(1, len(headers)):
+                ws.column_dimensions[get_column_letter(i + 1)].width = 15
+            ws.append(self.header_row(ws, headers))
+            for row in frame.itertuples(name=None):
+                values = [value.item() if hasattr(value, "item") else value for value in row]
+                # Unknown values (NaN) are left as blank cells
+                ws.append([None if isinstance(value, float) and value != value else value for value in values])
+
+    def header_row(self, ws, headers=None):
+        from openpyxl.cell import Cell, WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Alignment
+
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+        alignment = Alignment(horizontal="center", vertical="center")
+
+        row = []
+        for title in headers or self.headers:
+            cell = WriteOnlyCell(ws, value=title) if self.streaming else Cell(ws, value=title)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = alignment
+            row.append(cell)
+        return row
+
+
+class FxRates:
+    """Bank of Canada daily USD/CAD rates in a local SQLite table (fx_rates.db), converted as of each payment date"""
+
+    pair = "USDCAD"
+    series = "FXUSDCAD"
+    first_date = date(2017, 1, 3)  # start of the Valet series
+
+    def __init__(self, path="fx_rates.db", session=None, base_url=None):
+        self.path = Path(path)
+        self._session = session
+        self.base_url = base_url or os.getenv("FX_RATES_URL", "https://www.bankofcanada.ca/valet/observations")
+        self.conn = None
+        self.arrays = None  # (dates, rates) numpy arrays, read on first use
+        self.checked = False
+        self.lock = threading.Lock()
+
+    def connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS fx_rates (pair TEXT NOT NULL, date TEXT NOT NULL, "
+                "rate REAL NOT NULL, PRIMARY KEY (pair, date)) WITHOUT ROWID")
+        return self.conn
+
+    def latest(self):
+        """Newest stored rate date, or None"""
+        with self.lock:
+            row = self.connect().execute("SELECT MAX(date) FROM fx_rates WHERE pair = ?", (self.pair,)).fetchone()
+        return date.fromisoformat(row[0]) if row[0] else None
+
+    def store(self, rows):
+        """Insert (date, rate) rows in one transaction; returns how many"""
+        with self.lock, self.connect():
+            self.conn.executemany("INSERT OR REPLACE INTO fx_rates (pair, date, rate) VALUES (?, ?, ?)",
+                                  [(self.pair, day, rate) for day, rate in rows])
+            self.arrays = None
+        return len(rows)
+
+    def refresh(self, start=None):
+        """Fetch every rate after the newest stored one (or from `start`). Returns rows added."""
+        if start is None:
+            latest = self.latest()
+            start = latest + timedelta(days=1) if latest else self.first_date
+        if start > date.today():
+            return 0
+        session = self._session or shared_session()
+        with METRICS.span("http_request", provider="fx"):
+            response = session.get(f"{self.base_url}/{self.series}/json",
+                                   params={"start_date": start.isoformat()}, timeout=30)
+            response.raise_for_status()
+        rows = []
+        for observation in response.json().get("observations", []):
+            value = (observation.get(self.series) or {}).get("v")
+            if observation.get("d") and value:
+                rows.append((observation["d"], float(value)))
+        return self.store(rows)
+
+    def load_csv(self, path):
+        """Bulk-load date,rate rows from a CSV file; lines that don't parse (headers) are skipped"""
+        import csv
+
+        rows = []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                try:
+                    rows.append((date.fromisoformat(row[0].strip()).isoformat(), float(row[1])))
+                except (ValueError, IndexError):
+                    continue
+        return self.store(rows)
+
+    def ensure_current(self):
+        """Top up the table once per session if it is missing recent days; keeps what's stored on failure"""
+        if self.checked:
+            return
+        self.checked = True
+        latest = self.latest()
+        # Rates are published on business days, so a few days' gap is normal
+        if latest is not None and latest >= date.today() - timedelta(days=4):
+            return
+        if RESPONSE_CACHE.offline:
+            return
+        try:
+            added = self.refresh()
+            print(f"Loaded {added} USD/CAD rates")
+        except Exception as e:
+            print(f"Could not update FX rates: {e}")
+
+    def rates(self):
+        """Stored rates as sorted (datetime64[D] dates, float rates) arrays"""
+        import numpy as np
+
+        with self.lock:
+            if self.arrays is None:
+                rows = self.connect().execute(
+                    "SELECT date, rate FROM fx_rates WHERE pair = ? ORDER BY date", (self.pair,)).fetchall()
+                self.arrays = (np.array([row[0] for row in rows], dtype="datetime64[D]"),
+                               np.array([row[1] for row in rows], dtype=float))
+            return self.arrays
+
+    def rate_on(self, dates):
+        """USD/CAD in effect on each date; NaN for missing dates or dates before the first rate"""
+        import numpy as np
+
+        known, rates = self.rates()
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        i = np.searchsorted(known, dates, side="right") - 1
+        found = (i >= 0) & ~np.isnat(dates)
+        result = np.full(len(dates), np.nan)
+        result[found] = rates[i[found]]
+        return result
+
+    def convert(self, amounts, currencies, dates, to="USD"):
+        """(converted amounts, rates used) for parallel arrays; NaN where no rate applies"""
+        import numpy as np
+
+        amounts = np.asarray(amounts, dtype=float)
+        currencies = np.asarray(currencies, dtype=object)
+        rates = self.rate_on(dates)
+        converted = np.where(currencies == to, amounts, np.nan)
+        if to == "USD":
+            converted = np.where(currencies == "CAD", amounts / rates, converted)
+        elif to == "CAD":
+            converted = np.where(currencies == "USD", amounts * rates, converted)
+        return converted, rates
+
+    def convert_rows(self, rows, to="USD", chunk=10000):
+        """Extend export row tuples with the rate used and the converted amount, a chunk at a time"""
+        import itertools
+        import numpy as np
+
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, chunk))
+            if not batch:
+                return
+            converted, rates = self.convert([row[6] for row in batch], [row[5] for row in batch],
+                                            [row[3] or row[0] for row in batch], to)
+            rates = np.where(np.isnan(rates), None, rates).tolist()
+            converted = np.where(np.isnan(converted), None, converted).tolist()
+            for row, rate, value in zip(batch, rates, converted):
+                yield row + (rate, value)
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+class SymbolIndex:
+    """The portfolio's tickers keyed by symbol in portfolio order, plus a sorted list for prefix search"""
+
+    def __init__(self, tickers=()):
+        self.tickers = {}
+        for ticker in tickers:
+            self.tickers[ticker.symbol] = ticker
+        self.sorted = sorted(self.tickers)
+
+    def __contains__(self, symbol):
+        return symbol in self.tickers
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __iter__(self):
+        return iter(self.tickers.values())
+
+    def get(self, symbol):
+        return self.tickers.get(symbol)
+
+    def add(self, ticker):
+        """Add a ticker, or replace the one with the same symbol"""
+        if ticker.symbol not in self.tickers:
+            bisect.insort(self.sorted, ticker.symbol)
+        self.tickers[ticker.symbol] = ticker
+
+    def remove(self, symbol):
+        """Drop `symbol`; returns its ticker, or None if it wasn't there"""
+        ticker = self.tickers.pop(symbol, None)
+        if ticker is not None:
+            del self.sorted[bisect.bisect_left(self.sorted, symbol)]
+        return ticker
+
+    def symbols(self):
+        """Every symbol in portfolio order"""
+        return list(self.tickers)
+
+    def search(self, prefix):
+        """Symbols starting with `prefix`, in sorted order"""
+        lo = bisect.bisect_left(self.sorted, prefix)
+        hi = bisect.bisect_left(self.sorted, prefix + "\uffff", lo)
+        return self.sorted[lo:hi]
+
+
 class DividendDataManager:
     # Gather all ticker data necessary for excel and json...
-    def __init__(self):
+    def __init__(self, storage=None, load=True):
         
-        self.tickers = []
-        path = Path("dividend_data.json")
-        if path.is_file():
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                for item in data:
-                    self.tickers.append(StockTicker(item.get("ticker")))
+        self.index = SymbolIndex()
+        self.limiter = ALPHA_VANTAGE_LIMITER
+        self.cache = RESPONSE_CACHE
+        self.store = make_store(storage)
+        # Columnar copy of the stored dividends for export and analytics
+        self.snapshot = ColumnarSnapshot(self.store) if ColumnarSnapshot.available() else None
+        self.fx = FxRates()
+        self.loaded = False
+        if load:
+            self.finish_loading(self.load_tickers())
 
+    def load_tickers(self):
+        """Read the stored symbols (dividends load lazily) without touching self.index; safe on a worker thread"""
+        if self.snapshot is not None:
+            self.snapshot.load()
+        return [StockTicker.from_entry(entry, self.store.load_dividends)
+                for entry in self.store.load_index()]
 
+    @property
+    def tickers(self):
+        """Every ticker in portfolio order"""
+        return list(self.index)
 
+    def finish_loading(self, tickers):
+        """Install loaded tickers; any added while loading are merged into their stored history"""
+        added = self.index
+        index = SymbolIndex(tickers)
+        for ticker in added:
+            stored = index.get(ticker.symbol)
+            if stored is None:
+                index.add(ticker)
+            else:
+                stored.merge(ticker)
+        self.index = index
+        self.loaded = True
 
     def add_ticker(self, symbol):
         """Add a new ticker"""
         try:
-            ticker = StockTicker(symbol, True)
-            if ticker.data.get("dividends") is not None:  # Check if data was fetched successfully
-                self.tickers.append(ticker)
-                self.add_to_json(ticker)
-                return True
-            else:
-                return False
+            return self.commit_ticker(self.fetch_ticker(symbol))
         except Exception as e:
             print(f"Error adding ticker {symbol}: {e}")
             return False
 
-    def add_to_json(self, ticker):
-        path = Path("dividend_data.json")
-        if path.is_file():
-            with open(path, "r", encoding="utf-8") as f:
+    def fetch_ticker(self, symbol):
+        """Fetch a ticker's data without touching the portfolio (safe on worker threads)"""
+        return StockTicker(symbol, True, self.limiter, self.cache)
+
+    def commit_ticker(self, ticker):
+        """Add a fetched ticker to the portfolio and storage, keeping any stored history"""
+        if ticker.error is not None or ticker.data.get("dividends") is None:  # Check if data was fetched successfully
+            return False
+        held = self.index.get(ticker.symbol)
+        if held is not None:
+            added = held.merge(ticker)
+            if added:
+                self.store.merge([{"ticker": held.symbol, "currency": held.currency,
+                                   "dividends": [div.to_dict() for div in added]}])
+            return True
+        self.index.add(ticker)
+        # Merge rather than replace: the portfolio may still be loading, so
+        # the store can hold history for this symbol that the index hasn't seen
+        self.store.merge([ticker.to_entry()])
+        return True
+
+    def refresh_all(self, symbols=None, max_workers=4, progress=None):
+        """Re-fetch dividends newer than each stored watermark on a thread pool sharing self.limiter"""
+        if symbols is None:
+            symbols = self.index.symbols()
+        report = RefreshReport()
+        refreshed = []
+        start = time.monotonic()
+
+        # Providers that can fetch many symbols per call get whole batches;
+        # everything else is fetched one symbol per job
+        jobs = []
+        batched = {}
+        for symbol in symbols:
+            provider = provider_for(symbol)
+            if hasattr(provider, "fetch_many"):
+                batched.setdefault(provider, []).append(symbol)
+            else:
+                jobs.append([symbol])
+        for provider, grouped in batched.items():
+            jobs.extend(provider.batches(grouped))
+
+        done = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(self.fetch_tickers, job): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
                 try:
-                    data = json.load(f)
-                except json.JSONDecodeError:
-                    data = []
+                    tickers = future.result()
+                except Exception as e:
+                    tickers = []
+                    for symbol in job:
+                        report.failed[symbol] = str(e)
+                for ticker in tickers:
+                    if ticker.error:
+                        report.failed[ticker.symbol] = ticker.error
+                    else:
+                        refreshed.append(ticker)
+                        report.succeeded.append(ticker.symbol)
+                for symbol in job:
+                    done += 1
+                    if progress:
+                        progress(symbol, done, len(symbols))
+
+        # Merge fresh records into stored histories; only new ones are written
+        merged = []
+        for fresh in refreshed:
+            ticker = self.index.get(fresh.symbol)
+            if ticker is None:
+                self.index.add(fresh)
+                self.save([fresh])
+                report.new_dividends += len(fresh.dividends)
+                continue
+            added = ticker.merge(fresh)
+            if added:
+                merged.append({"ticker": ticker.symbol, "currency": ticker.currency,
+                               "dividends": [div.to_dict() for div in added]})
+                report.new_dividends += len(added)
+        if merged:
+            self.store.merge(merged)
+
+        report.elapsed = time.monotonic() - start
+        METRICS.observe("refresh", report.elapsed)
+        METRICS.count("tickers_refreshed", len(report.succeeded))
+        METRICS.count("tickers_failed", len(report.failed))
+        METRICS.write()
+        print(report.summary())
+        return report
+
+    def fetch_tickers(self, symbols):
+        """Fetch several symbols that share a provider, batched when it supports it"""
+        tickers = []
+        for symbol in symbols:
+            ticker = StockTicker(symbol, False, self.limiter, self.cache)
+            if symbol in self.index:
+                ticker.since = self.index.get(symbol).watermark
+            tickers.append(ticker)
+        provider = tickers[0].provider
+        if hasattr(provider, "fetch_many"):
+            provider.fetch_many(tickers)
         else:
-            data = []
+            for ticker in tickers:
+                ticker.fetch()
+        return tickers
 
-        data.append(ticker.data)
-                
-        with open(path, "w") as f:
-            json.dump(data, f, indent=2)
+    def save(self, tickers):
+        """Replace (or add) the stored entries for `tickers`"""
+        self.store.upsert([t.to_entry() for t in tickers])
 
     def remove_ticker(self, symbol):
-        self.tickers = [t for t in self.tickers if t.symbol != symbol]
-        print(symbol)
-        print(self.tickers)
-        self.remove_from_json(symbol)
+        self.index.remove(symbol)
+        print(f"Removed {symbol}")
+        self.store.remove(symbol)
 
-    def remove_from_json(self, symbol):
-        path = Path("dividend_data.json")
-        
-        if path.is_file():
-            with open(path, "r", encoding="utf-8") as f:
-                try:
-                    data = json.load(f)
-                except json.JSONDecodeError:
-                    data = []
+    def exporter(self, **options):
+        """ExcelExporter with FX-converted columns, reading from the columnar snapshot when pyarrow is installed"""
+        return ExcelExporter(snapshot=self.snapshot, fx=self.fx, **options)
 
-        # filter out the ticker
-        data = [entry for entry in data if entry.get("ticker") != symbol]
+    def close(self):
+        """Flush storage (compacts the JSON journal) and the metrics file"""
+        self.store.close()
+        self.fx.close()
+        METRICS.write()
 
-        # write back updated data
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-        
 
+class RefreshScheduler:
+    """Spends the Alpha Vantage quota on the tickers most likely to have a new dividend (see refresh_schedule.json)"""
+
+    default_interval = 7  # days between checks when the cadence is unknown
+
+    def __init__(self, manager, path="refresh_schedule.json"):
+        self.manager = manager
+        self.path = Path(path)
+        self.quota = {}  # {"date": ISO date, "used": Alpha Vantage calls made that day}
+        self.state = self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if state.get("version") != 1:
+            return {}
+        self.quota = state.get("quota", {})
+        return state.get("tickers", {})
+
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "quota": self.quota, "tickers": self.state}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def used_today(self, today):
+        """Alpha Vantage calls already made by scheduled runs on `today`"""
+        return self.quota.get("used", 0) if self.quota.get("date") == today.isoformat() else 0
+
+    @staticmethod
+    def cadence(ticker):
+        """Median days between the ticker's recent ex-dates, or None with fewer than two"""
+        dates = sorted({div.ex_date for div in ticker.dividends if div.ex_date})[-13:]
+        if len(dates) < 2:
+            return None
+        gap = statistics.median((b - a).days for a, b in zip(dates, dates[1:]))
+        return int(min(max(gap, 7), 366))
+
+    def due_date(self, ticker, today):
+        """When `ticker` should next be checked, predicted from its history once and then remembered"""
+        state = self.state.setdefault(ticker.symbol, {})
+        if "next_due" not in state:
+            gap = self.cadence(ticker)
+            if gap is None:
+                due = today
+            else:
+                due = ticker.watermark + timedelta(days=gap - self.lead(gap))
+            state.update(cadence_days=gap, next_due=due.isoformat())
+        return date.fromisoformat(state["next_due"])
+
+    @staticmethod
+    def lead(gap):
+        """Days ahead of a predicted ex-date to start looking for it"""
+        return min(7, gap // 4)
+
+    @staticmethod
+    def recheck(gap):
+        """Days between checks while an expected dividend hasn't appeared"""
+        return max(1, min(7, gap // 4))
+
+    def available_quota(self, today=None):
+        """Alpha Vantage calls left today: the limiter's bucket less what earlier runs used"""
+        today = today or date.today()
+        limiter = self.manager.limiter
+        with limiter.lock:
+            limiter.day.refill(time.monotonic())
+            tokens = int(limiter.day.tokens)
+        return max(0, min(tokens, limiter.day.capacity - self.used_today(today)))
+
+    def plan(self, today=None, budget=None):
+        """Due symbols in priority order that fit in `budget` (default: the remaining quota)"""
+        today = today or date.today()
+        budget = self.available_quota(today) if budget is None else budget
+        # Forget tickers that have left the portfolio, so a re-added one starts fresh
+        for symbol in [symbol for symbol in self.state if symbol not in self.manager.index]:
+            del self.state[symbol]
+        heap = []
+        for ticker in self.manager.index:
+            due = self.due_date(ticker, today)
+            last_checked = self.state[ticker.symbol].get("last_checked", "")
+            heap.append((due, last_checked, ticker.symbol))
+        heapq.heapify(heap)
+
+        planned = []
+        while heap and heap[0][0] <= today:
+            _, _, symbol = heapq.heappop(heap)
+            if isinstance(provider_for(symbol), AlphaVantageProvider):
+                if budget <= 0:
+                    continue
+                budget -= 1
+            planned.append(symbol)
+        return planned
+
+    def run(self, budget=None, max_workers=4, progress=None, today=None):
+        """Refresh the planned symbols, record what happened, and return the RefreshReport"""
+        today = today or date.today()
+        symbols = self.plan(today, budget)
+        before = {symbol: self.manager.index.get(symbol).watermark for symbol in symbols}
+        calls = self.manager.limiter.calls
+        report = self.manager.refresh_all(symbols, max_workers, progress)
+        self.quota = {"date": today.isoformat(),
+                      "used": self.used_today(today) + self.manager.limiter.calls - calls}
+        for symbol in symbols:
+            self.record(symbol, before[symbol], symbol in report.failed, today)
+        self.save()
+        return report
+
+    def record(self, symbol, watermark, failed, today):
+        """Work out the next check for `symbol` after a refresh"""
+        ticker = self.manager.index.get(symbol)
+        gap = self.cadence(ticker)
+        state = {"last_checked": today.isoformat(), "cadence_days": gap}
+        if failed:
+            state["result"] = "failed"
+            next_due = today + timedelta(days=1)
+        elif ticker.watermark != watermark:
+            # Found it: wait for the one after
+            state["result"] = "new"
+            if gap is None:
+                next_due = today + timedelta(days=self.default_interval)
+            else:
+                next_due = max(ticker.watermark + timedelta(days=gap - self.lead(gap)), today + timedelta(days=1))
+        else:
+            state["result"] = "unchanged"
+            if gap is None:
+                # Nothing to predict from: no point checking more than weekly
+                next_due = today + timedelta(days=self.default_interval)
+            else:
+                next_due = today + timedelta(days=self.recheck(gap))
+        state["next_due"] = next_due.isoformat()
+        self.state[symbol] = state
+        METRICS.count("scheduled_checks", symbol=symbol, result=state["result"])
 
 
 class StockTicker:
-    def __init__(self, symbol, new=False):
+    def __init__(self, symbol, new=False, limiter=None, cache=None, provider=None):
         self.symbol = symbol.strip().upper()
+        self.limiter = limiter or ALPHA_VANTAGE_LIMITER
+        self.cache = cache or RESPONSE_CACHE
+        self.error = None
         self.data = {
             "ticker": self.symbol,
             "currency": "USD",
             "dividends": []
         }
+        self.dividends = []  # parsed Dividend records
+        self.loader = None  # loader(symbol) -> stored dividend dicts, until first use
+        self.since = None  # only fetch dividends after this ex-date (see watermark)
+        self.provider = provider or provider_for(self.symbol)
         if new == True:
-            if self.symbol.endswith((".TO", ".V", ".CN", ":CA")):
-                self.fetch_tsx_dividends()
-            else:
-                self.fetch_dividends()
-
-    def fetch_tsx_dividends(self):
-        self.ticker = yf.Ticker(self.symbol)
-        self.data["currency"] = "CAD"
-        # Fetch the last 3 months of dividend data
-        div_series = self.ticker.get_dividends(period="3mo")
-
-        # Store as list of dicts
-        self.data["dividends"] = [
-            {"ex_dividend_date": date.strftime("%Y-%m-%d"), "amount": float(amount)}
-            for date, amount in div_series.items()
-        ]
-        print("Dividends for TSX stocks are being fetched!")
-        print(self.data)
-
-    def fetch_dividends(self):
-        """Fetch US stock dividends"""
-        from datetime import timedelta
-        print("Dividends for US stocks are being fetched!")
-        
-        # Get Alpha Vantage API key from environment
-        api_key = os.getenv("ALPHA_VANTAGE_API_KEY")
-        if not api_key:
-            print("Warning: ALPHA_VANTAGE_API_KEY not found in environment variables")
-            self.data["dividends"] = []
+            self.fetch()
+
+    @classmethod
+    def from_entry(cls, entry, loader=None):
+        """Ticker built from a stored portfolio entry without fetching; dividends come from loader if missing"""
+        ticker = cls(entry.get("ticker"))
+        ticker.data["currency"] = entry.get("currency", "USD")
+        if "dividends" in entry or loader is None:
+            ticker.dividends = [Dividend.from_dict(div) for div in entry.get("dividends", [])]
+        else:
+            ticker._dividends = None
+            ticker.loader = loader
+        return ticker
+
+    @property
+    def dividends(self):
+        """Parsed Dividend records, read from storage the first time if loaded lazily"""
+        if self._dividends is None:
+            self._dividends = [Dividend.from_dict(div) for div in self.loader(self.symbol)]
+            self.loader = None
+        return self._dividends
+
+    @dividends.setter
+    def dividends(self, records):
+        self._dividends = records
+        self.loader = None
+
+    @property
+    def currency(self):
+        return self.data["currency"]
+
+    def to_entry(self):
+        """Portfolio entry for storage, built from the parsed records"""
+        return {
+            "ticker": self.symbol,
+            "currency": self.currency,
+            "dividends": [div.to_dict() for div in self.dividends],
+        }
+
+    def fetch(self):
+        """Fetch dividends from this ticker's data provider"""
+        self.provider.fetch(self)
+
+    @property
+    def watermark(self):
+        """Newest stored ex-date, or None when nothing is stored yet"""
+        return max((div.ex_date for div in self.dividends if div.ex_date), default=None)
+
+    def merge(self, fresh):
+        """Fold a fresh fetch into this ticker's history, de-duplicated on ex-date; returns the new records"""
+        seen = {div.ex_date for div in self.dividends}
+        added = [div for div in fresh.dividends if div.ex_date not in seen]
+        self.data["currency"] = fresh.currency
+        if added:
+            self.dividends = sorted(added + self.dividends, key=lambda div: div.ex_date or date.min,
+                                    reverse=True)
+        return added
+
+    def set_dividends(self, dividends):
+        """Store fetched dividend dicts and their parsed records"""
+        self.data["dividends"] = dividends
+        self.dividends = [Dividend.from_dict(div) for div in dividends]
+
+    def store_dividends(self, data):
+        """Keep the dividends after self.since (or the last 6 months) of an Alpha Vantage payload"""
+        # Check if we got valid data
+        if "data" not in data or not data["data"]:
+            print(f"No dividend data found for {self.symbol}")
+            self.set_dividends([])
             return
-        
-        # Alpha Vantage API URL for dividend data
-        url = f'https://www.alphavantage.co/query?function=DIVIDENDS&symbol={self.symbol}&apikey={api_key}'
-        
-        # Retry logic for network failures
-        max_retries = 3
-        retry_delay = 1  # seconds
-        
-        for attempt in range(max_retries):
+
+        if self.since is not None:
+            # Only records newer than the stored watermark. Alpha Vantage lists
+            # newest first, so stop at the first one we already have.
+            floor = self.since.isoformat()
+            candidates = []
+            for div in data["data"]:
+                ex_date_str = div.get("ex_dividend_date") or ""
+                if ex_date_str[:1].isdigit() and ex_date_str <= floor:
+                    break
+                candidates.append(div)
+            records = [(Dividend.from_dict(div), div) for div in candidates]
+            kept = [(record, div) for record, div in records
+                    if record.ex_date is not None and record.ex_date > self.since]
+        else:
+            # Filter to last 6 months, parsing each record once
+            cutoff_date = date.today() - timedelta(days=180)
+            records = [(Dividend.from_dict(div), div) for div in data["data"]]
+            kept = [(record, div) for record, div in records
+                    if record.ex_date is not None and record.ex_date >= cutoff_date]
+
+        # Sort by date (newest first)
+        kept.sort(key=lambda pair: pair[0].ex_date, reverse=True)
+
+        self.data["dividends"] = [div for _, div in kept]
+        self.dividends = [record for record, _ in kept]
+        print(f"Successfully fetched {len(kept)} dividend records for {self.symbol}")
+
+
+class CommandLine:
+    """Headless entry point: python main.py refresh|schedule|export|add|remove|fx ..."""
+
+    export_formats = ("xlsx", "csv", "parquet")
+
+    def __init__(self, argv):
+        import argparse
+
+        parser = argparse.ArgumentParser(prog="main.py", description="Dividend Tracker batch commands")
+        parser.add_argument("--storage", choices=("json", "sqlite"), help="storage backend (default: DIVIDEND_STORAGE or json)")
+        parser.add_argument("--json", action="store_true", help="machine-readable JSON-lines output")
+        sub = parser.add_subparsers(dest="command", required=True)
+
+        refresh = sub.add_parser("refresh", help="re-fetch dividends for stored tickers")
+        refresh.add_argument("symbols", nargs="*", help="only these tickers (default: all)")
+        refresh.add_argument("--workers", type=int, default=4)
+
+        add = sub.add_parser("add", help="fetch and add tickers")
+        add.add_argument("symbols", nargs="+")
+        add.add_argument("--workers", type=int, default=4)
+
+        remove = sub.add_parser("remove", help="remove tickers")
+        remove.add_argument("symbols", nargs="+")
+
+        export = sub.add_parser("export", help="export dividends to xlsx, csv or parquet")
+        export.add_argument("--format", choices=self.export_formats, default=None,
+                            help="default: taken from --output's extension, else xlsx")
+        export.add_argument("--output", default=None, help="default: dividends-sheet.<format>")
+        export.add_argument("--full", action="store_true", help="rebuild the xlsx instead of updating it")
+
+        schedule = sub.add_parser("schedule", help="refresh the tickers most likely to have a new dividend, within quota")
+        schedule.add_argument("--budget", type=int, help="Alpha Vantage calls to spend (default: what's left today)")
+        schedule.add_argument("--dry-run", action="store_true", help="only print the plan")
+        schedule.add_argument("--workers", type=int, default=4)
+
+        fx = sub.add_parser("fx", help="bulk-load USD/CAD rates into fx_rates.db")
+        fx.add_argument("--start", type=date.fromisoformat, help="YYYY-MM-DD (default: after the newest stored rate)")
+        fx.add_argument("--csv", help="import date,rate rows from this file instead of downloading")
+
+        self.args = parser.parse_args(argv)
+        self.out = sys.stdout
+
+    def emit(self, event, **fields):
+        if self.args.json:
+            self.out.write(json.dumps(dict(event=event, **fields)) + "\n")
+            self.out.flush()
+        elif event == "progress":
+            self.out.write(f"[{fields['done']}/{fields['total']}] {fields['symbol']}\n")
+        elif event == "error":
+            sys.stderr.write(f"Error: {fields['message']}\n")
+        else:
+            self.out.write(" ".join(f"{k}={v}" for k, v in fields.items()) + "\n")
+
+    def run(self):
+        # Keep stdout clean for our own output; fetch diagnostics go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            manager = DividendDataManager(self.args.storage)
             try:
-                print(f"Fetching data for {self.symbol} (attempt {attempt + 1}/{max_retries})")
-                
-                # Make API request with timeout
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Check for API errors
-                if "Error Message" in data:
-                    print(f"API Error for {self.symbol}: {data['Error Message']}")
-                    self.data["dividends"] = []
-                    return
-                
-                if "Note" in data:
-                    print(f"API Rate Limit for {self.symbol}: {data['Note']}")
-                    if attempt < max_retries - 1:
-                        print(f"Waiting {retry_delay * 2} seconds before retry...")
-                        time.sleep(retry_delay * 2)
-                        retry_delay *= 2  # Exponential backoff
-                        continue
-                    else:
-                        print("Max retries reached. Using empty data.")
-                        self.data["dividends"] = []
-                        return
-                
-                # Check if we got valid data
-                if "data" not in data or not data["data"]:
-                    print(f"No dividend data found for {self.symbol}")
-                    self.data["dividends"] = []
-                    return
-                
-                # Filter to last 6 months
-                cutoff_date = datetime.now() - timedelta(days=180)
-                
-                filtered_dividends = []
-                for dividend in data["data"]:
-                    ex_date_str = dividend.get("ex_dividend_date")
-                    if ex_date_str and ex_date_str != "None":
-                        try:
-                            ex_date = datetime.strptime(ex_date_str, "%Y-%m-%d")
-                            if ex_date >= cutoff_date:
-                                filtered_dividends.append(dividend)
-                        except ValueError:
-                            continue
-                
-                # Sort by date (newest first)
-                filtered_dividends.sort(key=lambda x: x.get("ex_dividend_date", ""), reverse=True)
-                
-                self.data["dividends"] = filtered_dividends
-                print(f"Successfully fetched {len(filtered_dividends)} dividend records for {self.symbol}")
-                return  # Success, exit retry loop
-                
-            except requests.exceptions.Timeout:
-                print(f"Timeout error for {self.symbol} (attempt {attempt + 1})")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                    retry_delay *= 2
-                else:
-                    print("Max retries reached due to timeout.")
-                    self.data["dividends"] = []
-                    
-            except requests.exceptions.ConnectionError:
-                print(f"Connection error for {self.symbol} (attempt {attempt + 1})")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                    retry_delay *= 2
-                else:
-                    print("Max retries reached due to connection error.")
-                    self.data["dividends"] = []
-                    
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:  # Rate limit
-                    print(f"Rate limit exceeded for {self.symbol}")
-                    if attempt < max_retries - 1:
-                        wait_time = retry_delay * 5  # Longer wait for rate limits
-                        print(f"Waiting {wait_time} seconds before retry...")
-                        time.sleep(wait_time)
-                        retry_delay *= 2
-                    else:
-                        print("Max retries reached due to rate limiting.")
-                        self.data["dividends"] = []
-                else:
-                    print(f"HTTP error for {self.symbol}: {e}")
-                    self.data["dividends"] = []
-                    return
-                    
-            except Exception as e:
-                print(f"Unexpected error for {self.symbol}: {e}")
-                self.data["dividends"] = []
-                return
-    
+                return getattr(self, "cmd_" + self.args.command)(manager)
+            finally:
+                manager.close()
+                if self.args.json:
+                    self.emit("metrics", **METRICS.snapshot())
 
+    def report(self, result, missing=()):
+        """Emit a RefreshReport in the one result shape every fetching command uses"""
+        self.emit("result", succeeded=result.succeeded, failed=result.failed, missing=list(missing),
+                  new_dividends=result.new_dividends, elapsed=round(result.elapsed, 3))
+        return 1 if result.failed or missing else 0
+
+    def progress(self, symbol, done, total):
+        self.emit("progress", symbol=symbol, done=done, total=total)
+
+    def cmd_refresh(self, manager):
+        symbols = [s.strip().upper() for s in self.args.symbols]
+        # Only stored tickers are refreshed; use "add" for new ones
+        missing = [symbol for symbol in symbols if symbol not in manager.index]
+        held = [symbol for symbol in symbols if symbol in manager.index]
+        if symbols and not held:
+            return self.report(RefreshReport(), missing)
+        return self.report(manager.refresh_all(held or None, self.args.workers, self.progress), missing)
+
+    def cmd_add(self, manager):
+        symbols = []
+        for symbol in self.args.symbols:
+            is_valid, result = ValidationUtils.validate_ticker_symbol(symbol)
+            if not is_valid:
+                self.emit("error", symbol=symbol, message=result)
+                return 2
+            if ValidationUtils.is_duplicate_ticker(result, manager.index):
+                self.emit("error", symbol=result, message=f"'{result}' is already in your portfolio")
+                return 2
+            symbols.append(result)
+        return self.report(manager.refresh_all(symbols, self.args.workers, self.progress))
+
+    def cmd_remove(self, manager):
+        removed, missing = [], []
+        for symbol in self.args.symbols:
+            symbol = symbol.strip().upper()
+            if symbol in manager.index:
+                manager.remove_ticker(symbol)
+                removed.append(symbol)
+            else:
+                missing.append(symbol)
+        self.emit("result", removed=sorted(removed), missing=missing)
+        return 1 if missing else 0
+
+    def cmd_export(self, manager):
+        fmt, output = self.args.format, self.args.output
+        if fmt is None:
+            suffix = Path(output).suffix.lstrip(".").lower() if output else ""
+            fmt = suffix if suffix in self.export_formats else "xlsx"
+        output = output or f"dividends-sheet.{fmt}"
+
+        start = time.monotonic()
+        manager.fx.ensure_current()
+        try:
+            rows = manager.exporter().export_as(manager.tickers, output, fmt, full=self.args.full)
+        except Exception as e:
+            self.emit("error", message=f"Export to {output} failed: {e}")
+            return 1
+        self.emit("result", output=output, format=fmt, rows=rows, elapsed=round(time.monotonic() - start, 3))
+        return 0
+
+    def cmd_schedule(self, manager):
+        scheduler = RefreshScheduler(manager)
+        if self.args.dry_run:
+            self.emit("result", planned=scheduler.plan(budget=self.args.budget))
+            return 0
+        return self.report(scheduler.run(self.args.budget, self.args.workers, self.progress))
+
+    def cmd_fx(self, manager):
+        try:
+            if self.args.csv:
+                added = manager.fx.load_csv(self.args.csv)
+            else:
+                added = manager.fx.refresh(self.args.start)
+        except Exception as e:
+            self.emit("error", message=f"Loading FX rates failed: {e}")
+            return 1
+        latest = manager.fx.latest()
+        self.emit("result", added=added, latest=latest.isoformat() if latest else None)
+        return 0
+
+
+# Shared by every StockTicker that isn't handed its own limiter / cache
+ALPHA_VANTAGE_LIMITER = RateLimiter.from_env()
+RESPONSE_CACHE = ResponseCache.from_env()
 
 
 if __name__ == "__main__":
     import ctypes
+
+    # Any arguments mean a headless batch command instead of the GUI
+    if len(sys.argv) > 1:
+        sys.exit(CommandLine(sys.argv[1:]).run())
     
 
    
@@ -0,0 +1,129 @@
+"""Timing spans and counters, written as Prometheus text and JSON log lines"""
+
+import contextlib
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+
+class Metrics:
+    """Timing spans and counters, logged as JSON lines and written as Prometheus text"""
+
+    prefix = "dividend_tracker"
+
+    def __init__(self, path=None):
+        self.path = path
+        self.spans = {}  # (name, labels) -> [count, total seconds, max seconds]
+        self.counters = {}  # (name, labels) -> value
+        self.lock = threading.Lock()
+        self.log = logging.getLogger("dividends.metrics")
+
+    @classmethod
+    def from_env(cls):
+        """Build from DIVIDEND_METRICS_FILE and DIVIDEND_METRICS_LOG"""
+        log_path = os.getenv("DIVIDEND_METRICS_LOG")
+        if log_path:
+            logger = logging.getLogger("dividends.metrics")
+            if log_path == "-":
+                handler = logging.StreamHandler(sys.stderr)
+            else:
+                handler = logging.FileHandler(log_path, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+        return cls(os.getenv("DIVIDEND_METRICS_FILE") or None)
+
+    @contextlib.contextmanager
+    def span(self, name, symbol=None, **labels):
+        """Time the enclosed block as `name`, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, symbol, **labels)
+
+    def observe(self, name, seconds, symbol=None, **labels):
+        """Record a duration measured elsewhere"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            stat = self.spans.get(key)
+            if stat is None:
+                self.spans[key] = [1, seconds, seconds]
+            else:
+                stat[0] += 1
+                stat[1] += seconds
+                stat[2] = max(stat[2], seconds)
+        if self.log.isEnabledFor(logging.INFO):
+            self.emit(span=name, seconds=round(seconds, 6), symbol=symbol, **labels)
+
+    def count(self, name, n=1, symbol=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+        if self.log.isEnabledFor(logging.INFO):
+            self.emit(counter=name, n=n, symbol=symbol, **labels)
+
+    def emit(self, **fields):
+        fields = {k: v for k, v in fields.items() if v is not None}
+        self.log.info(json.dumps(dict(ts=round(time.time(), 3), **fields)))
+
+    @staticmethod
+    def series(name, labels):
+        if not labels:
+            return name
+        return name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+    def snapshot(self):
+        """Current totals as plain dicts keyed by series name"""
+        with self.lock:
+            spans = {self.series(name, labels): {"count": c, "sum": round(t, 6), "max": round(m, 6)}
+                     for (name, labels), (c, t, m) in sorted(self.spans.items())}
+            counters = {self.series(name, labels): value
+                        for (name, labels), value in sorted(self.counters.items())}
+        return {"spans": spans, "counters": counters}
+
+    def render(self):
+        """Prometheus text exposition of every span and counter"""
+        with self.lock:
+            spans = sorted(self.spans.items())
+            counters = sorted(self.counters.items())
+        lines = []
+        # Every line of a metric family must be contiguous, so each span's
+        # summary samples come first and its _max gauge family after them
+        for name, group in itertools.groupby(spans, key=lambda item: item[0][0]):
+            group = list(group)
+            metric = f"{self.prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for (_, labels), (c, t, m) in group:
+                lines.append(f"{self.series(metric + '_count', labels)} {c}")
+                lines.append(f"{self.series(metric + '_sum', labels)} {t:.6f}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            for (_, labels), (c, t, m) in group:
+                lines.append(f"{self.series(metric + '_max', labels)} {m:.6f}")
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{self.prefix}_{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{self.series(metric, labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=None):
+        """Atomically replace the Prometheus text file; no-op when none is configured"""
+        path = path or self.path
+        if not path:
+            return
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+
+# Shared by the app, the stores and the providers
+METRICS = Metrics.from_env()
@@ -0,0 +1,305 @@
+"""Dividend data providers: Alpha Vantage for US symbols, yfinance for TSX"""
+
+import os
+import threading
+import time
+from datetime import timedelta
+
+from metrics import METRICS
+
+
+def make_session(pool_size=10):
+    """Build a requests.Session with a keep-alive connection pool sized for our workers"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def shared_session():
+    """Process-wide pooled session, created on the first request"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+class DividendProvider:
+    """Base class for a source of dividend data"""
+
+    name = None
+    currency = "USD"
+
+    def supports(self, symbol):
+        raise NotImplementedError
+
+    def fetch(self, ticker):
+        raise NotImplementedError
+
+
+class AlphaVantageProvider(DividendProvider):
+    """US dividends from the Alpha Vantage DIVIDENDS endpoint"""
+
+    name = "alphavantage"
+
+    def __init__(self, session=None, base_url=None):
+        self._session = session
+        self.base_url = base_url or os.getenv("ALPHA_VANTAGE_BASE_URL", "https://www.alphavantage.co/query")
+
+    def supports(self, symbol):
+        return True
+
+    @property
+    def session(self):
+        """The shared pooled session unless one was passed in, created on first use"""
+        return self._session or shared_session()
+
+    def fetch(self, ticker):
+        """Fetch US stock dividends"""
+        import requests
+
+        print("Dividends for US stocks are being fetched!")
+
+        # Serve from the response cache when we have a fresh copy
+        params = {"function": "DIVIDENDS"}
+        cached = ticker.cache.get(self.name, ticker.symbol, params)
+        if cached is not None:
+            print(f"Using cached dividend data for {ticker.symbol}")
+            with METRICS.span("filter", ticker.symbol, provider=self.name):
+                ticker.store_dividends(cached)
+            return
+        if ticker.cache.offline:
+            print(f"Offline mode: no cached data for {ticker.symbol}")
+            ticker.error = "Not cached (offline mode)"
+            ticker.data["dividends"] = []
+            return
+        
+        # Get Alpha Vantage API key from environment
+        api_key = os.getenv("ALPHA_VANTAGE_API_KEY")
+        if not api_key:
+            print("Warning: ALPHA_VANTAGE_API_KEY not found in environment variables")
+            ticker.error = "ALPHA_VANTAGE_API_KEY not set"
+            ticker.data["dividends"] = []
+            return
+        
+        # Alpha Vantage query for dividend data
+        query = dict(params, symbol=ticker.symbol, apikey=api_key)
+        
+        # Retry logic for network failures
+        max_retries = 3
+        retry_delay = 1  # seconds
+        
+        for attempt in range(max_retries):
+            try:
+                # Wait for a token from the shared quota instead of sleeping here
+                if not ticker.limiter.acquire():
+                    print(f"Daily API quota exhausted, skipping {ticker.symbol}")
+                    ticker.error = "Daily API quota exhausted"
+                    ticker.data["dividends"] = []
+                    return
+
+                print(f"Fetching data for {ticker.symbol} (attempt {attempt + 1}/{max_retries})")
+                METRICS.count("requests", symbol=ticker.symbol, provider=self.name)
+                if attempt:
+                    METRICS.count("retries", symbol=ticker.symbol, provider=self.name)
+                
+                # Make API request with timeout
+                with METRICS.span("http_request", ticker.symbol, provider=self.name):
+                    response = self.session.get(self.base_url, params=query, timeout=30)
+                    response.raise_for_status()
+                with METRICS.span("json_decode", ticker.symbol, provider=self.name):
+                    data = response.json()
+                
+                # Check for API errors
+                if "Error Message" in data:
+                    print(f"API Error for {ticker.symbol}: {data['Error Message']}")
+                    ticker.error = data["Error Message"]
+                    ticker.data["dividends"] = []
+                    return
+                
+                # Alpha Vantage answers throttled calls with a "Note" or an "Information" payload
+                throttle = data.get("Note") or data.get("Information")
+                if throttle:
+                    print(f"API Rate Limit for {ticker.symbol}: {throttle}")
+                    METRICS.count("throttle_notes", symbol=ticker.symbol, provider=self.name)
+                    if attempt < max_retries - 1:
+                        print(f"Waiting {retry_delay * 2} seconds before retry...")
+                        ticker.limiter.pause(retry_delay * 2)
+                        retry_delay *= 2  # Exponential backoff
+                        continue
+                    else:
+                        print("Max retries reached. Using empty data.")
+                        ticker.error = "Rate limited by API"
+                        ticker.data["dividends"] = []
+                        return
+                
+                # Only a real dividend list is worth serving again from the cache
+                if isinstance(data.get("data"), list) and data["data"]:
+                    ticker.cache.put(self.name, ticker.symbol, params, data)
+                with METRICS.span("filter", ticker.symbol, provider=self.name):
+                    ticker.store_dividends(data)
+                return  # Success, exit retry loop
+                
+            except requests.exceptions.Timeout:
+                print(f"Timeout error for {ticker.symbol} (attempt {attempt + 1})")
+                if attempt < max_retries - 1:
+                    with METRICS.span("backoff_sleep", ticker.symbol, provider=self.name):
+                        time.sleep(retry_delay)
+                    retry_delay *= 2
+                else:
+                    print("Max retries reached due to timeout.")
+                    ticker.error = "Timed out"
+                    ticker.data["dividends"] = []
+                    
+            except requests.exceptions.ConnectionError:
+                print(f"Connection error for {ticker.symbol} (attempt {attempt + 1})")
+                if attempt < max_retries - 1:
+                    with METRICS.span("backoff_sleep", ticker.symbol, provider=self.name):
+                        time.sleep(retry_delay)
+                    retry_delay *= 2
+                else:
+                    print("Max retries reached due to connection error.")
+                    ticker.error = "Connection error"
+                    ticker.data["dividends"] = []
+                    
+            except requests.exceptions.HTTPError as e:
+                if e.response.status_code == 429:  # Rate limit
+                    print(f"Rate limit exceeded for {ticker.symbol}")
+                    METRICS.count("http_429", symbol=ticker.symbol, provider=self.name)
+                    if attempt < max_retries - 1:
+                        wait_time = retry_delay * 5  # Longer wait for rate limits
+                        print(f"Waiting {wait_time} seconds before retry...")
+                        ticker.limiter.pause(wait_time)
+                        retry_delay *= 2
+                    else:
+                        print("Max retries reached due to rate limiting.")
+                        ticker.error = "Rate limited by API"
+                        ticker.data["dividends"] = []
+                else:
+                    print(f"HTTP error for {ticker.symbol}: {e}")
+                    ticker.error = f"HTTP error: {e}"
+                    ticker.data["dividends"] = []
+                    return
+                    
+            except Exception as e:
+                print(f"Unexpected error for {ticker.symbol}: {e}")
+                ticker.error = str(e)
+                ticker.data["dividends"] = []
+                return
+
+
+class YFinanceProvider(DividendProvider):
+    """Canadian dividends from Yahoo Finance, fetched in batches of `batch_size` per yf.download call"""
+
+    name = "yfinance"
+    currency = "CAD"
+    suffixes = (".TO", ".V", ".CN", ":CA")
+
+    def __init__(self, session=None, batch_size=None, period=None):
+        # Recent yfinance releases manage their own curl_cffi session, so we
+        # only hand one over when explicitly given
+        self.session = session
+        self.batch_size = batch_size or int(os.getenv("YFINANCE_BATCH_SIZE", "50"))
+        self.period = period or os.getenv("YFINANCE_PERIOD", "3mo")
+
+    def supports(self, symbol):
+        return symbol.endswith(self.suffixes)
+
+    def batches(self, symbols):
+        for i in range(0, len(symbols), self.batch_size):
+            yield symbols[i:i + self.batch_size]
+
+    def fetch(self, ticker):
+        self.fetch_many([ticker])
+
+    def fetch_many(self, tickers):
+        """Fill in dividends for up to batch_size tickers with a single download"""
+        watermarks = [ticker.since for ticker in tickers]
+        if all(watermarks):
+            params = {"start": (min(watermarks) + timedelta(days=1)).isoformat()}
+        else:
+            params = {"period": self.period}
+        pending = []
+        for ticker in tickers:
+            ticker.data["currency"] = self.currency
+            dividends = ticker.cache.get(self.name, ticker.symbol, params)
+            if dividends is not None:
+                self.set_dividends(ticker, dividends)
+            elif ticker.cache.offline:
+                print(f"Offline mode: no cached data for {ticker.symbol}")
+                ticker.error = "Not cached (offline mode)"
+            else:
+                pending.append(ticker)
+        if not pending:
+            return
+
+        import yfinance as yf
+
+        symbols = [ticker.symbol for ticker in pending]
+        print(f"Dividends for TSX stocks are being fetched! ({', '.join(symbols)})")
+        kwargs = {"session": self.session} if self.session is not None else {}
+        METRICS.count("requests", symbol=",".join(symbols), provider=self.name)
+        with METRICS.span("http_request", ",".join(symbols), provider=self.name):
+            frame = yf.download(symbols, actions=True, group_by="ticker", auto_adjust=False,
+                                progress=False, threads=True, **params, **kwargs)
+
+        with METRICS.span("filter", ",".join(symbols), provider=self.name):
+            self.split_frame(frame, pending, params)
+
+    def split_frame(self, frame, pending, params):
+        """Cache and store each pending ticker's dividends from a multi-ticker download"""
+        # Older yfinance releases return flat columns when only one symbol was requested
+        flat = frame is not None and frame.columns.nlevels == 1
+        for ticker in pending:
+            if flat:
+                columns = frame if len(pending) == 1 else None
+            else:
+                try:
+                    columns = frame[ticker.symbol]
+                except KeyError:
+                    columns = None
+            if columns is None or columns.dropna(how="all").empty:
+                print(f"No data returned for {ticker.symbol}")
+                ticker.error = "No data returned"
+                continue
+
+            div_series = columns["Dividends"] if "Dividends" in columns else columns.iloc[:0, 0]
+            div_series = div_series[div_series > 0]
+
+            # Store as list of dicts
+            dividends = [
+                {"ex_dividend_date": date.strftime("%Y-%m-%d"), "amount": float(amount)}
+                for date, amount in div_series.items()
+            ]
+            ticker.cache.put(self.name, ticker.symbol, params, dividends)
+            self.set_dividends(ticker, dividends)
+
+    @staticmethod
+    def set_dividends(ticker, dividends):
+        """Keep only dividends after the ticker's watermark, if it has one"""
+        if ticker.since is not None:
+            floor = ticker.since.isoformat()
+            dividends = [div for div in dividends if div["ex_dividend_date"] > floor]
+        ticker.set_dividends(dividends)
+
+
+def provider_for(symbol):
+    """First registered provider that supports `symbol`"""
+    for provider in PROVIDERS:
+        if provider.supports(symbol):
+            return provider
+    raise ValueError(f"No data provider for {symbol}")
+
+
+# Checked in order; Alpha Vantage is the catch-all for US symbols
+PROVIDERS = [YFinanceProvider(), AlphaVantageProvider()]
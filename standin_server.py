@@ -0,0 +1,184 @@
+"""Local stand-in for the Alpha Vantage DIVIDENDS endpoint.
+
+Replays recorded payloads so fetch throughput and retry behaviour can be
+load-tested without touching the network or spending API quota.
+
+Recordings are looked up in two places:
+  * a directory of <SYMBOL>.json files holding raw Alpha Vantage responses
+  * dividend_data.json, whose stored dividends are wrapped back into the
+    Alpha Vantage response shape
+
+Usage:
+    python standin_server.py                    # serve on 127.0.0.1:8765
+    python standin_server.py --load-test 200    # serve and refresh 200 symbols
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+
+class StandInServer:
+    """Threaded HTTP server replaying recorded Alpha Vantage payloads.
+
+    Failure injection knobs:
+      latency     - seconds added to every response
+      note_rate   - fraction of responses that return a rate-limit "Note"
+      error_rate  - fraction of responses that return HTTP 429
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, recordings=None,
+                 portfolio="dividend_data.json", latency=0.0, note_rate=0.0, error_rate=0.0):
+        self.payloads = {}
+        self.latency = latency
+        self.note_rate = note_rate
+        self.error_rate = error_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.load_portfolio(portfolio)
+        if recordings:
+            self.load_recordings(recordings)
+        self.httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/query"
+
+    def load_portfolio(self, path):
+        path = Path(path)
+        if not path.is_file():
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for entry in json.load(f):
+                self.payloads[entry["ticker"]] = {
+                    "symbol": entry["ticker"],
+                    "data": entry.get("dividends", []),
+                }
+
+    def load_recordings(self, directory):
+        for path in Path(directory).glob("*.json"):
+            with open(path, "r", encoding="utf-8") as f:
+                self.payloads[path.stem.upper()] = json.load(f)
+
+    def payload_for(self, symbol):
+        """Recorded payload, or a synthetic one for unknown symbols"""
+        payload = self.payloads.get(symbol)
+        if payload is None:
+            payload = next(iter(self.payloads.values()), {"data": []})
+            payload = dict(payload, symbol=symbol)
+        return payload
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                query = parse_qs(urlparse(self.path).query)
+                symbol = query.get("symbol", [""])[0].upper()
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                roll = random.random()
+                if roll < server.error_rate:
+                    self.reply(429, {"Error": "Too Many Requests"})
+                elif roll < server.error_rate + server.note_rate:
+                    self.reply(200, {"Note": "Thank you for using Alpha Vantage! (stand-in throttle)"})
+                elif not symbol:
+                    self.reply(200, {"Error Message": "Invalid API call."})
+                else:
+                    self.reply(200, server.payload_for(symbol))
+
+            def reply(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def load_test(server, count, workers):
+    """Refresh `count` symbols against the stand-in server and report throughput"""
+    import os
+    os.environ.setdefault("ALPHA_VANTAGE_API_KEY", "standin")
+    import main
+    import providers
+
+    provider = providers.AlphaVantageProvider(providers.make_session(workers), base_url=server.url)
+    # Route every symbol through the stand-in server
+    providers.PROVIDERS[:] = [provider]
+    symbols = [f"SYM{i}" for i in range(count)]
+
+    # A throwaway portfolio and cache in a temp directory, so the real
+    # portfolio (and any dividend_data.db) is never read or written
+    here = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            manager = main.DividendDataManager()
+            manager.limiter = main.RateLimiter(per_minute=10 ** 9, per_day=10 ** 9)
+            manager.cache = main.ResponseCache("cache", ttl=0)
+
+            start = time.perf_counter()
+            report = manager.refresh_all(symbols, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            manager.close()
+        finally:
+            os.chdir(here)
+
+    print(f"{server.requests} requests, {len(report.succeeded)} ok, {len(report.failed)} failed")
+    print(f"{count / elapsed:.1f} tickers/s over {elapsed:.2f}s with {workers} workers")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--recordings", help="directory of <SYMBOL>.json Alpha Vantage payloads")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--note-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--load-test", type=int, metavar="N", help="refresh N symbols against the server and exit")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    server = StandInServer(args.host, args.port, args.recordings, latency=args.latency,
+                           note_rate=args.note_rate, error_rate=args.error_rate).start()
+    print(f"Stand-in Alpha Vantage server on {server.url}")
+    try:
+        if args.load_test:
+            load_test(server, args.load_test, args.workers)
+        else:
+            server.thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
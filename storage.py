@@ -0,0 +1,550 @@
+"""Portfolio storage: the JSON and SQLite stores and the columnar snapshot"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+
+from metrics import METRICS
+
+
+class Dividend:
+    """One dividend payment with parsed dates and a numeric amount"""
+
+    __slots__ = ("ex_date", "declaration_date", "record_date", "payment_date", "amount")
+
+    def __init__(self, ex_date, amount, declaration_date=None, record_date=None, payment_date=None):
+        self.ex_date = ex_date
+        self.amount = amount
+        self.declaration_date = declaration_date
+        self.record_date = record_date
+        self.payment_date = payment_date
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def parse_date(value):
+        """date from a "YYYY-MM-DD" string; None for missing or "None" values"""
+        if not value or value == "None":
+            return None
+        try:
+            return date.fromisoformat(value[:10])
+        except (ValueError, TypeError):
+            return None
+
+    @classmethod
+    def from_dict(cls, div):
+        """Parse a stored or fetched dividend dict (ex_date or ex_dividend_date layout)"""
+        amount = div.get("amount")
+        try:
+            amount = float(amount) if amount else 0.0
+        except (ValueError, TypeError):
+            amount = 0.0
+        return cls(
+            cls.parse_date(div.get("ex_date") or div.get("ex_dividend_date")),
+            amount,
+            cls.parse_date(div.get("declaration_date")),
+            cls.parse_date(div.get("record_date")),
+            cls.parse_date(div.get("payment_date")),
+        )
+
+    def to_dict(self):
+        """Storage layout used in dividend_data.json"""
+        div = {"ex_dividend_date": self.ex_date.isoformat() if self.ex_date else None}
+        for name in ("declaration_date", "record_date", "payment_date"):
+            value = getattr(self, name)
+            if value is not None:
+                div[name] = value.isoformat()
+        div["amount"] = self.amount
+        return div
+
+    def __repr__(self):
+        return f"Dividend({self.ex_date}, {self.amount})"
+
+
+class JsonStore:
+    """Portfolio kept as a JSON snapshot (dividend_data.json) plus an append-only journal"""
+
+    def __init__(self, path="dividend_data.json", compact_every=500):
+        self.path = Path(path)
+        self.journal_path = self.path.with_suffix(".journal")
+        self.index_path = self.path.with_suffix(".index.json")
+        self.compact_every = compact_every
+        self.journal_ops = None  # counted on first load
+        self.offsets = None  # symbol -> (start, end) byte range in the snapshot
+        self.offsets_stamp = None  # (size, mtime_ns) of the snapshot they describe
+        self.lock = threading.RLock()
+
+    def exists(self):
+        return self.path.is_file() or self.journal_path.is_file()
+
+    def symbols(self):
+        return [entry.get("ticker") for entry in self.load_index()]
+
+    def load_entries(self):
+        """All portfolio entries: the snapshot with the journal replayed on top"""
+        with self.lock:
+            entries = {}
+            if self.path.is_file():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for entry in json.load(f):
+                        entries[entry.get("ticker")] = entry
+            self.journal_ops = self.replay(entries)
+            return list(entries.values())
+
+    def stamp(self):
+        """Changes whenever the stored portfolio does: snapshot and journal size and mtime"""
+        return file_stamp(self.path) + file_stamp(self.journal_path)
+
+    def load_index(self):
+        """Every entry's ticker and currency, without reading dividends"""
+        with self.lock:
+            entries = {}
+            for symbol, currency in self.snapshot_offsets():
+                entries[symbol] = {"ticker": symbol, "currency": currency}
+            self.journal_ops = self.replay(entries, fill=self.fill_entry)
+            return list(entries.values())
+
+    def load_dividends(self, symbol):
+        """One ticker's stored dividends, read from its byte range in the snapshot"""
+        with self.lock:
+            if self.offsets is None or file_stamp(self.path) != self.offsets_stamp:
+                self.snapshot_offsets()  # re-index if the snapshot changed underneath us
+            span = self.offsets.get(symbol)
+            if span is None:
+                return []
+            with open(self.path, "rb") as f:
+                f.seek(span[0])
+                return json.loads(f.read(span[1] - span[0])).get("dividends", [])
+
+    def fill_entry(self, entry):
+        entry["dividends"] = self.load_dividends(entry["ticker"])
+
+    def snapshot_offsets(self):
+        """[(symbol, currency)] in snapshot order, refreshing self.offsets if stale"""
+        stamp = file_stamp(self.path)
+        if stamp == [0, 0]:
+            self.offsets, self.offsets_stamp = {}, stamp
+            return []
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") != 1 or index["stamp"] != stamp:
+                index = None
+        except (OSError, ValueError, KeyError):
+            index = None
+        if index is None:
+            # Missing or stale sidecar (first run, or the file was edited by
+            # hand): one full pass over the snapshot rebuilds it
+            index = {"version": 1, "stamp": stamp, "entries": self.scan_offsets()}
+            self.write_index(index)
+        self.offsets = {symbol: (start, end) for symbol, _, start, end in index["entries"]}
+        self.offsets_stamp = stamp
+        return [(symbol, currency) for symbol, currency, _, _ in index["entries"]]
+
+    def scan_offsets(self):
+        """Parse the snapshot entry by entry, noting where each one starts and ends"""
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        text = raw.decode("utf-8")
+        same_width = len(text) == len(raw)  # pure ASCII, as json.dump writes by default
+        decoder = json.JSONDecoder()
+        separators = re.compile(r"[\s,]*")
+        entries = []
+        pos = separators.match(text).end()
+        if text[pos:pos + 1] != "[":
+            raise ValueError(f"{self.path} is not a JSON list")
+        pos = separators.match(text, pos + 1).end()
+        byte_pos = char_pos = 0
+        while text[pos:pos + 1] not in ("]", ""):
+            entry, end = decoder.raw_decode(text, pos)
+            if same_width:
+                start, stop = pos, end
+            else:
+                start = byte_pos + len(text[char_pos:pos].encode("utf-8"))
+                stop = start + len(text[pos:end].encode("utf-8"))
+                byte_pos, char_pos = stop, end
+            entries.append([entry.get("ticker"), entry.get("currency", "USD"), start, stop])
+            pos = separators.match(text, end).end()
+        return entries
+
+    def write_index(self, index):
+        tmp = self.index_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, self.index_path)
+
+    def replay(self, entries, fill=None):
+        """Apply journal operations to `entries`; returns how many were applied"""
+        if not self.journal_path.is_file():
+            return 0
+        ops = 0
+        good = 0  # byte offset just past the last complete operation
+        with open(self.journal_path, "r+b") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete journal line")
+                    op = json.loads(line)
+                except ValueError:
+                    # Torn final write from a crash: cut it off so later
+                    # appends start on a clean line
+                    f.truncate(good)
+                    break
+                if fill is not None and op["op"] == "merge":
+                    entry = entries.get(op["entry"]["ticker"])
+                    if entry is not None and "dividends" not in entry:
+                        fill(entry)
+                self.apply(entries, op)
+                ops += 1
+                good += len(line)
+        return ops
+
+    @staticmethod
+    def apply(entries, op):
+        if op["op"] == "upsert":
+            entries[op["entry"]["ticker"]] = op["entry"]
+        elif op["op"] == "merge":
+            new = op["entry"]
+            entry = entries.get(new["ticker"])
+            if entry is None:
+                entries[new["ticker"]] = new
+                return
+            ex_date = lambda div: div.get("ex_date") or div.get("ex_dividend_date") or ""
+            seen = {ex_date(div) for div in entry.get("dividends", [])}
+            added = [div for div in new["dividends"] if ex_date(div) not in seen]
+            entry["currency"] = new.get("currency", entry.get("currency"))
+            entry["dividends"] = sorted(added + entry.get("dividends", []), key=ex_date, reverse=True)
+        elif op["op"] == "remove":
+            entries.pop(op["ticker"], None)
+
+    def append(self, ops):
+        """Append ops to the journal in one write"""
+        with self.lock:
+            if self.journal_ops is None:
+                self.load_entries()  # also trims any torn tail
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(op) + "\n" for op in ops))
+                f.flush()
+                os.fsync(f.fileno())
+            self.journal_ops += len(ops)
+            if self.journal_ops >= self.compact_every:
+                self.compact()
+
+    def upsert(self, entries):
+        """Replace (or append) the stored entries for these tickers"""
+        self.append([{"op": "upsert", "entry": entry} for entry in entries])
+
+    def merge(self, entries):
+        """Add new dividends to stored tickers, de-duplicated on ex-date"""
+        self.append([{"op": "merge", "entry": entry} for entry in entries])
+
+    def remove(self, symbol):
+        self.append([{"op": "remove", "ticker": symbol}])
+
+    def compact(self):
+        """Fold the journal into a new snapshot via write-to-temp-and-rename"""
+        with self.lock:
+            data = self.load_entries()
+            tmp = self.path.with_suffix(".json.tmp")
+            entries = []
+            with open(tmp, "w", encoding="utf-8") as f:
+                # Written one entry at a time (same layout as json.dump with
+                # indent=2) so each entry's byte range goes into the index
+                f.write("[")
+                pos = 1
+                for i, entry in enumerate(data):
+                    prefix = ",\n  " if i else "\n  "
+                    text = json.dumps(entry, indent=2).replace("\n", "\n  ")
+                    entries.append([entry.get("ticker"), entry.get("currency", "USD"),
+                                    pos + len(prefix), pos + len(prefix) + len(text)])
+                    f.write(prefix + text)
+                    pos += len(prefix) + len(text)
+                f.write("\n]" if data else "]")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            st = self.path.stat()
+            self.write_index({"version": 1, "stamp": [st.st_size, st.st_mtime_ns], "entries": entries})
+            if self.journal_path.is_file():
+                self.journal_path.unlink()
+            self.journal_ops = 0
+
+    def close(self):
+        if self.journal_ops:
+            self.compact()
+
+
+class SqliteStore:
+    """Portfolio kept in SQLite, with one row per ticker and per dividend"""
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS tickers (
+            symbol TEXT PRIMARY KEY,
+            currency TEXT NOT NULL DEFAULT 'USD',
+            position INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS dividends (
+            ticker TEXT NOT NULL REFERENCES tickers(symbol) ON DELETE CASCADE,
+            ex_date TEXT NOT NULL,
+            declaration_date TEXT,
+            record_date TEXT,
+            payment_date TEXT,
+            amount REAL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS dividends_ticker_ex_date ON dividends (ticker, ex_date);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, path="dividend_data.db"):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(self.schema)
+
+    def exists(self):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM tickers LIMIT 1").fetchone() is not None
+
+    def symbols(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT symbol FROM tickers ORDER BY position")]
+
+    def load_entries(self):
+        """All portfolio entries in the dividend_data.json layout"""
+        with self.lock:
+            tickers = self.conn.execute("SELECT symbol, currency FROM tickers ORDER BY position").fetchall()
+            # rowid order keeps each ticker's dividends in the order they were stored
+            rows = self.conn.execute(
+                "SELECT ticker, ex_date, declaration_date, record_date, payment_date, amount "
+                "FROM dividends ORDER BY rowid").fetchall()
+
+        dividends = {}
+        for row in rows:
+            dividends.setdefault(row[0], []).append(self.dividend_dict(row))
+        return [{"ticker": symbol, "currency": currency, "dividends": dividends.get(symbol, [])}
+                for symbol, currency in tickers]
+
+    def stamp(self):
+        """Changes whenever the stored portfolio does (checkpoints don't count)"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return [str(self.path.resolve()), row[0] if row else 0]
+
+    def bump_generation(self):
+        """Count a mutation; called inside each write transaction"""
+        self.conn.execute("INSERT INTO meta (key, value) VALUES ('generation', 1) "
+                          "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+    def load_index(self):
+        """Every entry's ticker and currency; dividends come from load_dividends()"""
+        with self.lock:
+            return [{"ticker": symbol, "currency": currency} for symbol, currency in
+                    self.conn.execute("SELECT symbol, currency FROM tickers ORDER BY position")]
+
+    def load_dividends(self, symbol):
+        """One ticker's stored dividends, through the (ticker, ex_date) index"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT ticker, ex_date, declaration_date, record_date, payment_date, amount "
+                "FROM dividends WHERE ticker = ? ORDER BY rowid", (symbol,)).fetchall()
+        return [self.dividend_dict(row) for row in rows]
+
+    @staticmethod
+    def dividend_dict(row):
+        """dividend_data.json layout of a dividends row"""
+        _, ex_date, declaration_date, record_date, payment_date, amount = row
+        div = {"ex_dividend_date": ex_date, "amount": amount}
+        if declaration_date is not None:
+            div["declaration_date"] = declaration_date
+        if record_date is not None:
+            div["record_date"] = record_date
+        if payment_date is not None:
+            div["payment_date"] = payment_date
+        return div
+
+    @staticmethod
+    def dividend_row(symbol, div):
+        # Handle both TSX (ex_date) and US (ex_dividend_date) formats
+        ex_date = div.get("ex_date") or div.get("ex_dividend_date")
+        amount = div.get("amount")
+        try:
+            amount = float(amount) if amount else 0
+        except (ValueError, TypeError):
+            amount = 0
+        return (symbol, ex_date, div.get("declaration_date"), div.get("record_date"),
+                div.get("payment_date"), amount)
+
+    def upsert(self, entries):
+        """Replace the stored ticker row and dividends for each entry, in one transaction"""
+        with self.lock, self.conn:
+            self.bump_generation()
+            position = self.conn.execute("SELECT COALESCE(MAX(position), 0) FROM tickers").fetchone()[0]
+            for entry in entries:
+                symbol = entry["ticker"]
+                position += 1
+                self.conn.execute(
+                    "INSERT INTO tickers (symbol, currency, position) VALUES (?, ?, ?) "
+                    "ON CONFLICT(symbol) DO UPDATE SET currency = excluded.currency",
+                    (symbol, entry.get("currency", "USD"), position))
+                self.conn.execute("DELETE FROM dividends WHERE ticker = ?", (symbol,))
+                self.conn.executemany(
+                    "INSERT INTO dividends (ticker, ex_date, declaration_date, record_date, payment_date, amount) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(ticker, ex_date) DO UPDATE SET declaration_date = excluded.declaration_date, "
+                    "record_date = excluded.record_date, payment_date = excluded.payment_date, "
+                    "amount = excluded.amount",
+                    [self.dividend_row(symbol, div) for div in entry.get("dividends", [])
+                     if div.get("ex_date") or div.get("ex_dividend_date")])
+
+    def merge(self, entries):
+        """Insert only dividends not already stored for each ticker, in one transaction"""
+        with self.lock, self.conn:
+            self.bump_generation()
+            position = self.conn.execute("SELECT COALESCE(MAX(position), 0) FROM tickers").fetchone()[0]
+            for entry in entries:
+                symbol = entry["ticker"]
+                position += 1
+                self.conn.execute(
+                    "INSERT INTO tickers (symbol, currency, position) VALUES (?, ?, ?) "
+                    "ON CONFLICT(symbol) DO UPDATE SET currency = excluded.currency",
+                    (symbol, entry.get("currency", "USD"), position))
+                self.conn.executemany(
+                    "INSERT INTO dividends (ticker, ex_date, declaration_date, record_date, payment_date, amount) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(ticker, ex_date) DO NOTHING",
+                    [self.dividend_row(symbol, div) for div in entry.get("dividends", [])
+                     if div.get("ex_date") or div.get("ex_dividend_date")])
+
+    def remove(self, symbol):
+        with self.lock, self.conn:
+            self.bump_generation()
+            self.conn.execute("DELETE FROM tickers WHERE symbol = ?", (symbol,))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def migrate_from_json(self, json_path="dividend_data.json"):
+        """One-shot import of an existing dividend_data.json. Returns the ticker count."""
+        entries = JsonStore(json_path).load_entries()
+        self.upsert(entries)
+        print(f"Migrated {len(entries)} tickers from {json_path} to {self.path}")
+        return len(entries)
+
+
+def file_stamp(path):
+    """[size, mtime_ns] of `path`, or [0, 0] if it doesn't exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return [0, 0]
+    return [st.st_size, st.st_mtime_ns]
+
+
+class ColumnarSnapshot:
+    """Every stored dividend as one memory-mapped Arrow table, rebuilt when the store changes"""
+
+    date_columns = ("ex_date", "declaration_date", "record_date", "payment_date")
+
+    def __init__(self, store, path=None):
+        self.store = store
+        # One file per store, e.g. dividend_data.json.arrow next to dividend_data.json
+        self.path = Path(path or f"{store.path}.arrow")
+        self.cached = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def available():
+        import importlib.util
+        return importlib.util.find_spec("pyarrow") is not None
+
+    def table(self):
+        """The current table, rebuilding the file first if the store has changed"""
+        with self.lock:
+            stamp = json.dumps(self.store.stamp())
+            if self.cached is None or self.stamp_of(self.cached) != stamp:
+                self.cached = self.open(stamp)
+            if self.cached is None:
+                with METRICS.span("snapshot_rebuild"):
+                    self.cached = self.rebuild(stamp)
+            return self.cached
+
+    def load(self):
+        """Map the file if it is current; never rebuilds (cheap enough for startup)"""
+        with self.lock:
+            self.cached = self.open(json.dumps(self.store.stamp()))
+            return self.cached is not None
+
+    @staticmethod
+    def stamp_of(table):
+        return (table.schema.metadata or {}).get(b"stamp", b"").decode()
+
+    def open(self, stamp):
+        import pyarrow as pa
+
+        try:
+            table = pa.ipc.open_file(pa.memory_map(str(self.path), "r")).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return None
+        return table if self.stamp_of(table) == stamp else None
+
+    def rebuild(self, stamp):
+        """Build the table from the store and write it with write-to-temp-and-rename"""
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        order, codes, currencies = [], [], []
+        columns = {name: [] for name in self.date_columns}
+        amounts = []
+        for entry in self.store.load_entries():
+            code = len(order)
+            order.append(entry["ticker"])
+            currency = entry.get("currency", "USD")
+            for div in entry.get("dividends", []):
+                record = Dividend.from_dict(div)
+                codes.append(code)
+                currencies.append(currency)
+                for name in self.date_columns:
+                    columns[name].append(getattr(record, name))
+                amounts.append(record.amount)
+
+        arrays = {"ticker": pa.DictionaryArray.from_arrays(pa.array(codes, pa.int32()),
+                                                           pa.array(order, pa.string()))}
+        arrays["currency"] = pa.array(currencies, pa.string()).dictionary_encode()
+        for name in self.date_columns:
+            arrays[name] = pa.array(columns[name], pa.date32())
+        arrays["amount"] = pa.array(amounts, pa.float64())
+        table = pa.table(arrays, metadata={"stamp": stamp})
+
+        tmp = self.path.with_suffix(".arrow.tmp")
+        feather.write_feather(table, str(tmp), compression="uncompressed")
+        self.cached = None  # drop our mapping of the old file before replacing it
+        try:
+            os.replace(tmp, self.path)
+        except OSError:
+            # Still mapped elsewhere (Windows won't replace it); serve this
+            # copy from memory and try again on the next change
+            return table
+        return self.open(stamp) or table
+
+
+def make_store(kind=None):
+    """Storage backend named by `kind` or DIVIDEND_STORAGE ("json" or "sqlite")"""
+    kind = (kind or os.getenv("DIVIDEND_STORAGE", "json")).lower()
+    if kind == "json":
+        return JsonStore()
+    if kind == "sqlite":
+        store = SqliteStore()
+        if not store.exists() and JsonStore().exists():
+            store.migrate_from_json()
+        return store
+    raise ValueError(f"Unknown storage backend: {kind}")
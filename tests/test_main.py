@@ -0,0 +1,79 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+import main
+import providers
+
+
+def history(symbol, count, last=date(2026, 9, 1), gap=30):
+    """Stored portfolio entry with `count` monthly dividends ending at `last`"""
+    return {"ticker": symbol, "currency": "USD", "dividends": [
+        {"ex_dividend_date": (last - timedelta(days=gap * i)).isoformat(), "amount": "0.5"}
+        for i in range(count)]}
+
+
+@pytest.fixture
+def portfolio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("dividend_data.json", "w", encoding="utf-8") as f:
+        json.dump([history("ULTY", 26), history("AAPL", 4, gap=91)], f)
+    return tmp_path
+
+
+def fetched(symbol, dividends):
+    ticker = main.StockTicker(symbol)
+    ticker.set_dividends(dividends)
+    return ticker
+
+
+@pytest.mark.parametrize("storage", ["json", "sqlite"])
+def test_add_while_loading_keeps_stored_history(portfolio, storage):
+    manager = main.DividendDataManager(storage, load=False)
+    new = {"ex_dividend_date": "2026-10-01", "amount": "0.6"}
+    assert manager.commit_ticker(fetched("ULTY", [new]))
+    manager.finish_loading(manager.load_tickers())
+    assert len(manager.index.get("ULTY").dividends) == 27
+    manager.close()
+
+    reloaded = main.DividendDataManager(storage)
+    assert len(reloaded.index.get("ULTY").dividends) == 27
+    assert reloaded.index.symbols()[:2] == ["ULTY", "AAPL"]
+    reloaded.close()
+
+
+def test_commit_held_ticker_merges(portfolio):
+    manager = main.DividendDataManager("json")
+    stored = manager.index.get("AAPL").dividends[0].to_dict()
+    assert manager.commit_ticker(fetched("AAPL", [stored]))
+    assert len(manager.index.get("AAPL").dividends) == 4
+    manager.close()
+    assert len(main.DividendDataManager("json").index.get("AAPL").dividends) == 4
+
+
+class NothingNew(providers.AlphaVantageProvider):
+    """Alpha Vantage stand-in that never finds a new dividend"""
+
+    def fetch(self, ticker):
+        ticker.set_dividends([])
+
+
+def test_unknown_cadence_is_checked_weekly(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(providers, "PROVIDERS", [providers.YFinanceProvider(), NothingNew()])
+    with open("dividend_data.json", "w", encoding="utf-8") as f:
+        json.dump([history("NODIV", 0), history("ONCE", 1)], f)
+    manager = main.DividendDataManager("json")
+    manager.limiter = main.RateLimiter(per_minute=100, per_day=100)
+    manager.cache = main.ResponseCache("cache", ttl=0)
+
+    start = date(2026, 10, 1)
+    checked = []
+    for day in range(8):
+        scheduler = main.RefreshScheduler(manager)
+        report = scheduler.run(today=start + timedelta(days=day))
+        checked.append(sorted(report.succeeded))
+    assert checked == [["NODIV", "ONCE"]] + [[]] * 6 + [["NODIV", "ONCE"]]
+    assert scheduler.state["NODIV"]["next_due"] == (start + timedelta(days=14)).isoformat()
+    manager.close()